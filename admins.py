@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+from pymongo.errors import PyMongoError
+
+from database import run_sync
+
+# Change stream bo'lmasa (replica set emas), ro'yxat shu oraliqda qayta yuklanadi
+ADMIN_REFRESH_INTERVAL = int(os.getenv("ADMIN_REFRESH_INTERVAL", "60"))
+
+
+class AdminRegistry:
+    """Adminlar ro'yxati xotirada — tekshiruv uchun DB ga murojaat qilinmaydi."""
+
+    def __init__(self, admins_col, main_admin_id: int, refresh_interval=ADMIN_REFRESH_INTERVAL):
+        self.admins_col = admins_col
+        self.main_admin_id = main_admin_id
+        self.refresh_interval = refresh_interval
+        self._ids = frozenset([main_admin_id])
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self._ids
+
+    def all(self):
+        """Asosiy admin birinchi, keyin qolganlari"""
+        return [self.main_admin_id] + sorted(self._ids - {self.main_admin_id})
+
+    def extra(self):
+        return sorted(self._ids - {self.main_admin_id})
+
+    async def load(self):
+        docs = await self.admins_col.find_list({}, projection={"user_id": 1})
+        ids = {self.main_admin_id}
+        for doc in docs:
+            try:
+                ids.add(int(doc["user_id"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        self._ids = frozenset(ids)
+
+    async def add(self, user_id: int) -> bool:
+        if self.is_admin(user_id):
+            return False
+        result = await self.admins_col.update_one(
+            {"user_id": user_id}, {"$setOnInsert": {"user_id": user_id}}, upsert=True
+        )
+        self._ids = self._ids | {user_id}
+        # Boshqa worker allaqachon qo'shgan bo'lsa (xotiradagi ro'yxat hali yangilanmagan)
+        return result.upserted_id is not None
+
+    async def remove(self, user_id: int) -> bool:
+        result = await self.admins_col.delete_one({"user_id": user_id})
+        self._ids = self._ids - {user_id}
+        return result.deleted_count > 0
+
+    async def _watch(self):
+        stream = await run_sync(self.admins_col.sync.watch)
+        try:
+            while True:
+                change = await run_sync(stream.try_next)
+                if change is not None:
+                    await self.load()
+        finally:
+            stream.close()
+
+    async def run(self):
+        """Boshqa workerlardagi o'zgarishlarni kuzatib boradi"""
+        try:
+            await self._watch()
+        except PyMongoError as e:
+            print(f"Adminlar change stream ishlamadi, polling rejimi: {e}")
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                print(f"Adminlarni yangilashda xato: {e}")
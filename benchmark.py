@@ -0,0 +1,380 @@
+"""Yuklama benchmarki: soxta Bot API serveri + mongomock (yoki alohida mongod).
+
+    python benchmark.py --users 1000 --latency 0.05 --flood 0.01
+    python benchmark.py --json before.json
+    python benchmark.py --json after.json --compare before.json
+    python benchmark.py --mongo-uri mongodb://localhost:27017 --mongo-db kino_bot_bench
+
+Ssenariylar: start, search, top, serial, broadcast. Har biri uchun o'tkazuvchanlik
+(update/s) va handlerlar bo'yicha p50/p99 kechikish chiqariladi.
+mongomock bitta thread'da ishlaydi (MONGO_POOL_SIZE=1), shuning uchun Mongo
+vaqtlarini real bazadagi bilan emas, faqat run'lar orasida solishtirish kerak.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+SCENARIOS = ("start", "search", "top", "serial", "broadcast")
+USER_ID_BASE = 10_000_000
+WORDS = (
+    "qora", "tun", "sevgi", "qasos", "yo'l", "shahar", "sir", "osmon", "dengiz", "o'g'ri",
+    "qirol", "bahor", "yulduz", "soya", "olov", "muz", "tog'", "bo'ron", "oltin", "temir",
+    "night", "city", "love", "war", "king", "dark", "star", "fire", "ice", "storm",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kino bot yuklama benchmarki")
+    parser.add_argument("--users", type=int, default=1000, help="bir vaqtdagi foydalanuvchilar")
+    parser.add_argument("--films", type=int, default=2000, help="bazadagi kinolar")
+    parser.add_argument("--serials", type=int, default=100, help="bazadagi seriallar")
+    parser.add_argument("--parts", type=int, default=24, help="har bir serialdagi qismlar")
+    parser.add_argument("--channels", type=int, default=1, help="majburiy kanallar")
+    parser.add_argument("--latency", type=float, default=0.03, help="Bot API o'rtacha kechikishi (s)")
+    parser.add_argument("--flood", type=float, default=0.0, help="429 qaytarish ehtimoli (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="429 dagi retry_after (s)")
+    parser.add_argument("--broadcast-rate", type=float, default=0, help="broadcast tezligi (0 — sozlamadagi)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="vergul bilan: " + ",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-uri", help="mongomock o'rniga haqiqiy mongod (baza tozalanadi!)")
+    parser.add_argument("--mongo-db", default="kino_bot_bench")
+    parser.add_argument("--json", help="natijani JSON faylga yozish")
+    parser.add_argument("--compare", help="oldingi JSON natija bilan solishtirish")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"noma'lum ssenariy: {', '.join(sorted(unknown))}")
+    return args
+
+
+def setup_environment(args):
+    """bot.py import qilinishidan oldin chaqiriladi"""
+    os.environ["BOT_TOKEN"] = "123456:BENCHMARK-benchmark"
+    os.environ["BOT_MODE"] = "polling"
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+        os.environ["MONGO_DB"] = args.mongo_db
+        return
+    import mongomock
+    import pymongo
+    os.environ["MONGO_URI"] = "mongodb://mongomock"
+    os.environ.setdefault("MONGO_POOL_SIZE", "1")
+    client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: client
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class FakeBotAPI:
+    """Telegram Bot API o'rnida lokal HTTP server: chaqiruvlarni sanaydi, kechikish va 429 qo'shadi"""
+
+    def __init__(self, latency=0.0, flood=0.0, retry_after=1):
+        self.latency = latency
+        self.flood = flood
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.floods = Counter()
+        self._ids = itertools.count(1)
+        self._runner = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        data = await request.post()
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if self.flood and random.random() < self.flood:
+            self.floods[method] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        return web.json_response({"ok": True, "result": self.result(method, data)})
+
+    def result(self, method, data):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method == "getChatMember":
+            return {"user": {"id": int(data["user_id"]), "is_bot": False, "first_name": "U"}, "status": "member"}
+        if method == "getChat":
+            return {"id": -100100, "type": "channel", "title": "Bench", "username": "bench"}
+        if method == "copyMessage":
+            return {"message_id": next(self._ids)}
+        if method == "copyMessages":
+            return [{"message_id": next(self._ids)} for _ in json.loads(data["message_ids"])]
+        if method in ("answerCallbackQuery", "answerInlineQuery", "deleteMessage", "setWebhook", "deleteWebhook"):
+            return True
+        chat_id = data.get("chat_id", "1")
+        return {
+            "message_id": next(self._ids), "date": int(time.time()),
+            "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else 1, "type": "private"},
+            "text": data.get("text", ""),
+        }
+
+
+class Workload:
+    """Bazani to'ldirish, update'lar yasash va ssenariylarni ishga tushirish"""
+
+    def __init__(self, bot_module, args):
+        from metrics import HandlerTimingMiddleware
+
+        self.B = bot_module
+        self.args = args
+        self.films = []    # (code, title)
+        self.serials = []  # (_id, code)
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self.handler_samples = defaultdict(list)
+        samples = self.handler_samples
+
+        class Recorder(HandlerTimingMiddleware):
+            def _finish(self, event, data):
+                timing = data.get("_timing")
+                if timing:
+                    samples[timing[0]].append(time.perf_counter() - timing[1])
+
+        bot_module.dp.middleware.setup(Recorder(resolve=bot_module.menu.resolve))
+
+    # ---------- baza ----------
+
+    def title(self):
+        return " ".join(random.sample(WORDS, 3)).title()
+
+    async def seed(self):
+        import database
+        B, args = self.B, self.args
+        for col in (B.users_col, B.approved_videos_col, B.channels_col, B.settings_col,
+                    database.counters_col, database.broadcasts_col, database.fsm_col):
+            await col.delete_many({})
+        films = []
+        for i in range(1, args.films + 1):
+            code = str(i).zfill(4)
+            title = self.title()
+            self.films.append((code, title))
+            films.append({"code": code, "title": title, "chat_id": -100200, "message_id": i,
+                          "is_serial": False, "views": random.randint(0, 5000)})
+        serials = []
+        for i in range(1, args.serials + 1):
+            parts = [{"chat_id": -100200, "message_id": 100000 + i * 1000 + p} for p in range(args.parts)]
+            serials.append({"code": f"S{i:03d}", "title": self.title(), "is_serial": True,
+                            "parts": parts, "views": random.randint(0, 5000)})
+        if films:
+            await B.approved_videos_col.insert_many(films)
+        if serials:
+            await B.approved_videos_col.insert_many(serials)
+        self.serials = [(doc["_id"], doc["code"]) for doc in serials]
+        await B.users_col.insert_many([
+            {"user_id": USER_ID_BASE + i, "username": f"user{i}"} for i in range(args.users)
+        ])
+        for i in range(args.channels):
+            await B.channels_col.insert_one({
+                "channel_id": str(-100300 - i), "title": f"Kanal {i}", "link": f"https://t.me/bench{i}"
+            })
+        await asyncio.get_running_loop().run_in_executor(None, database.run_migrations)
+        await B.admin_registry.load()
+        await B.search_index.load()
+        await B.leaderboard.load()
+        await B.stats.load()
+
+    # ---------- update'lar ----------
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": "U", "username": f"user{user_id}"}
+
+    def message(self, user_id, text):
+        from aiogram import types
+        msg = {"message_id": next(self._message_ids), "date": int(time.time()),
+               "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id), "text": text}
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return types.Update(update_id=next(self._update_ids), message=msg)
+
+    def callback(self, user_id, data):
+        from aiogram import types
+        return types.Update(update_id=next(self._update_ids), callback_query={
+            "id": str(next(self._update_ids)), "chat_instance": "bench", "data": data,
+            "from": self._user(user_id),
+            "message": {"message_id": next(self._message_ids), "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"},
+                        "from": {"id": 1, "is_bot": True, "first_name": "Bench"}, "text": "picker"},
+        })
+
+    def script(self, scenario, user_id):
+        if scenario == "start":
+            return [self.message(user_id, "/start")]
+        if scenario == "search":
+            if random.random() < 0.3:
+                query = random.choice(self.films)[0]
+            else:
+                query = random.choice(WORDS)[:4]
+            return [self.message(user_id, "🎬 Kino qidirish"), self.message(user_id, query),
+                    self.message(user_id, "🔙 Orqaga")]
+        if scenario == "top":
+            return [self.message(user_id, "🏆 Top kinolar")]
+        if scenario == "serial":
+            serial_id, code = random.choice(self.serials)
+            last = min(self.args.parts, 10) - 1
+            return [self.message(user_id, "🎬 Kino qidirish"), self.message(user_id, code),
+                    self.callback(user_id, f"ep_{serial_id}_0_{last}"), self.message(user_id, "🔙 Orqaga")]
+        raise ValueError(scenario)
+
+    # ---------- ishga tushirish ----------
+
+    async def process(self, update, stats):
+        from aiogram import Bot, Dispatcher
+        Bot.set_current(self.B.bot)
+        Dispatcher.set_current(self.B.dp)
+        start = time.perf_counter()
+        try:
+            await self.B.dp.process_update(update)
+        except Exception as e:
+            stats["errors"][type(e).__name__] += 1
+        stats["latency"].append(time.perf_counter() - start)
+
+    async def run_user(self, updates, stats):
+        for update in updates:
+            # Har bir update o'z kontekstida (FSM/current obyektlar aralashmasligi uchun)
+            await asyncio.create_task(self.process(update, stats))
+
+    async def run_scenario(self, scenario):
+        stats = {"latency": [], "errors": Counter()}
+        start = time.perf_counter()
+        if scenario == "broadcast":
+            return await self.run_broadcast(stats, start)
+        scripts = [self.script(scenario, USER_ID_BASE + i) for i in range(self.args.users)]
+        await asyncio.gather(*(self.run_user(updates, stats) for updates in scripts))
+        elapsed = time.perf_counter() - start
+        return {
+            "updates": len(stats["latency"]),
+            "seconds": elapsed,
+            "throughput": len(stats["latency"]) / elapsed if elapsed else 0,
+            "p50_ms": percentile(stats["latency"], 0.5) * 1000,
+            "p99_ms": percentile(stats["latency"], 0.99) * 1000,
+            "errors": dict(stats["errors"]),
+        }
+
+    async def run_broadcast(self, stats, start):
+        B = self.B
+        if self.args.broadcast_rate:
+            from ratelimit import RateLimiter
+            B.broadcaster.limiter = RateLimiter(self.args.broadcast_rate)
+        admin = B.MAIN_ADMIN_ID
+        await self.run_user([self.message(admin, "📢 Xabar yuborish"), self.message(admin, "Benchmark xabari")], stats)
+        while B.broadcaster.active:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        job = await B.broadcasts_col.find_one({}, sort=[("_id", -1)]) or {}
+        delivered = job.get("sent", 0) + job.get("blocked", 0) + job.get("failed", 0)
+        errors = dict(stats["errors"])
+        if job.get("failed"):
+            errors["failed"] = job["failed"]
+        return {
+            "updates": delivered,
+            "seconds": elapsed,
+            "throughput": delivered / elapsed if elapsed else 0,
+            "p50_ms": percentile(stats["latency"], 0.5) * 1000,
+            "p99_ms": percentile(stats["latency"], 0.99) * 1000,
+            "errors": errors,
+        }
+
+
+def print_report(results, previous=None):
+    def delta(section, key, field):
+        try:
+            before = previous[section][key][field]
+        except (KeyError, TypeError):
+            return ""
+        return f" ({(results[section][key][field] - before) / before * 100:+.0f}%)" if before else ""
+
+    print("\nSsenariylar (broadcast uchun — yuborilgan xabarlar):")
+    print(f"{'ssenariy':<12}{'soni':>8}{'soniya':>9}{'birlik/s':>12}{'p50 ms':>10}{'p99 ms':>10}  xatolar")
+    for name, r in results["scenarios"].items():
+        print(f"{name:<12}{r['updates']:>8}{r['seconds']:>9.2f}{r['throughput']:>12.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}  {r['errors'] or '-'}"
+              f"{delta('scenarios', name, 'throughput')}")
+    print("\nHandlerlar:")
+    print(f"{'handler':<28}{'soni':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, r in sorted(results["handlers"].items(), key=lambda item: -item[1]["p99_ms"]):
+        print(f"{name:<28}{r['count']:>8}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{delta('handlers', name, 'p99_ms')}")
+    print("\nBot API chaqiruvlari:")
+    for method, count in sorted(results["api_calls"].items(), key=lambda item: -item[1]):
+        floods = results["api_floods"].get(method, 0)
+        print(f"  {method:<24}{count:>8}" + (f"  (429: {floods})" if floods else ""))
+
+
+async def main(args):
+    random.seed(args.seed)
+    setup_environment(args)
+    import bot as B
+    from aiogram.bot.api import TelegramAPIServer
+
+    api = FakeBotAPI(args.latency, args.flood, args.retry_after)
+    B.bot.server = TelegramAPIServer.from_base(await api.start())
+    workload = Workload(B, args)
+    print(f"🌱 Baza to'ldirilmoqda: {args.films} kino, {args.serials} serial, {args.users} foydalanuvchi")
+    await workload.seed()
+    background = [asyncio.create_task(B.view_counter.run()), asyncio.create_task(B.user_registry.run())]
+
+    results = {"args": vars(args), "scenarios": {}, "handlers": {}}
+    try:
+        for scenario in args.scenarios:
+            print(f"▶️ {scenario}...")
+            results["scenarios"][scenario] = await workload.run_scenario(scenario)
+    finally:
+        for task in background:
+            task.cancel()
+        await B.on_shutdown(B.dp)
+        await (await B.bot.get_session()).close()
+        await api.stop()
+
+    for name, samples in workload.handler_samples.items():
+        results["handlers"][name] = {
+            "count": len(samples),
+            "p50_ms": percentile(samples, 0.5) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+        }
+    results["api_calls"] = dict(api.calls)
+    results["api_floods"] = dict(api.floods)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(results, previous)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Natija: {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,31 +1,60 @@
 import os
-import threading
-from flask import Flask
+import json
+import asyncio
+import itertools
+import logging
+import signal
+from queue import Empty
+from aiohttp import web
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton,
-    InlineKeyboardMarkup, InlineKeyboardButton,
+    InlineKeyboardMarkup, InlineKeyboardButton, InputFile,
     ContentTypes  # ✅ to'g'ri import
 )
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
-
+from aiogram.utils.exceptions import TelegramAPIError
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+
+from admins import AdminRegistry
+from menu import MenuRouter
+import metrics
+from metrics import MeteredBot, HandlerTimingMiddleware, Gauge
+from profiling import PROFILE_HANDLERS, ProfilingMiddleware
+from broadcast import Broadcaster
+from exporter import Exporter
+from importer import CatalogImporter, MirrorQueue, mirror_job
+from inline import InlineSearch
+from moderation import ModerationQueue
+from notify import AdminNotifier, Notifier
+from ratelimit import BOT_RATE, RateLimiter, bot_limiter, call_with_retry
+from search import SearchIndex, ResultCache, normalize
+from stats import StatsService
+from storage import MongoFSMStorage
+from supervisor import Supervisor
+from users import UserRegistry, LastSeenMiddleware
+from views import ViewCounter, Leaderboard
+from subscription import SubscriptionChecker
 from database import (
     users_col, pending_videos_col, approved_videos_col,
-    channels_col, admins_col, settings_col
+    channels_col, admins_col, settings_col, counters_col, broadcasts_col,
+    fsm_col, mirror_col, CodeAllocator, run_migrations
 )
 
 # ======================================
 # Yordamchi funksiyalar
 # ======================================
 
-def get_base_channel():
-    setting = settings_col.find_one({"key": "base_channel"})
+async def get_base_channel():
+    setting = await settings_col.find_one({"key": "base_channel"})
     return setting["value"] if setting else None
 
-def set_base_channel(channel_id):
-    settings_col.update_one(
+async def set_base_channel(channel_id):
+    await settings_col.update_one(
         {"key": "base_channel"},
         {"$set": {"value": channel_id}},
         upsert=True
@@ -37,10 +66,31 @@ MONGO_URI = os.getenv("MONGO_URI")
 if not BOT_TOKEN or not MONGO_URI:
     raise ValueError("BOT_TOKEN yoki MONGO_URI muhit o'zgaruvchisi mavjud emas!")
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(bot, storage=MemoryStorage())
+bot = MeteredBot(token=BOT_TOKEN)
+dp = Dispatcher(bot, storage=MongoFSMStorage(fsm_col))
+subscriptions = SubscriptionChecker(bot, channels_col)
+search_index = SearchIndex(approved_videos_col, counters_col)
+inline_search = InlineSearch(search_index)
+search_cache = ResultCache(search_index)
+view_counter = ViewCounter(approved_videos_col)
+leaderboard = Leaderboard(approved_videos_col)
+stats = StatsService(users_col, approved_videos_col, pending_videos_col)
+code_allocator = CodeAllocator(counters_col)
+moderation = ModerationQueue(pending_videos_col, approved_videos_col, code_allocator)
+catalog_importer = CatalogImporter(approved_videos_col, counters_col, mirror_col, code_allocator)
+mirror_queue = MirrorQueue(bot, mirror_col)
+exporter = Exporter({"catalog": approved_videos_col, "users": users_col}, settings_col)
+broadcaster = Broadcaster(bot, users_col, broadcasts_col)
+# Foydalanuvchiga qism yuborish tezligi (umumiy BOT_RATE budjetidan)
+delivery_limiter = RateLimiter(float(os.getenv("DELIVERY_RATE", "20")), parent=bot_limiter)
+view_counter.listeners.append(leaderboard.apply)
+user_registry = UserRegistry(users_col)
+dp.middleware.setup(LastSeenMiddleware(user_registry))
 
 MAIN_ADMIN_ID = 7162630033
+admin_registry = AdminRegistry(admins_col, MAIN_ADMIN_ID)
+admin_notifier = AdminNotifier(bot, admin_registry)
+user_notifier = Notifier(bot)
 
 # ======================================
 # Holatlar (FSM)
@@ -49,6 +99,9 @@ MAIN_ADMIN_ID = 7162630033
 class AddChannel(StatesGroup):
     waiting_for_channel = State()
 
+class BaseChannelState(StatesGroup):
+    waiting_for_channel = State()
+
 class SendMessageToAdmin(StatesGroup):
     waiting_for_message = State()
 
@@ -65,6 +118,7 @@ class AddSerial(StatesGroup):
     waiting_for_code = State()
     waiting_for_title = State()
     waiting_for_parts = State()
+    waiting_for_new_code = State()
 
 class SearchState(StatesGroup):
     searching = State()
@@ -78,6 +132,10 @@ class RemoveVideoState(StatesGroup):
 class AddMovieState(StatesGroup):
     waiting_for_movie = State()
 
+class ImportState(StatesGroup):
+    waiting_for_file = State()
+    confirm_mirror = State()
+
 # ======================================
 # Menyular
 # ======================================
@@ -95,7 +153,8 @@ def admin_menu():
         [KeyboardButton(text="🆕 Kino qo'shish"), KeyboardButton(text="📺 Serial qo'shish")],
         [KeyboardButton(text="📢 Xabar yuborish"), KeyboardButton(text="🔍 Majburiy kanallar")],
         [KeyboardButton(text="📡 Baza kanal"), KeyboardButton(text="🗑 Kino o'chirish")],
-        [KeyboardButton(text="👑 Admin qo'shish")],
+        [KeyboardButton(text="👑 Admin qo'shish"), KeyboardButton(text="🗂 Moderatsiya")],
+        [KeyboardButton(text="📥 Import"), KeyboardButton(text="💾 Eksport")],
         [KeyboardButton(text="🗑 Admin o'chirish"), KeyboardButton(text="📋 Adminlar")],
         [KeyboardButton(text="🔙 Orqaga")]
     ]
@@ -105,30 +164,162 @@ def back_button():
     kb = [[KeyboardButton(text="🔙 Orqaga")]]
     return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
 
+# Menyu tugmalari lug'at orqali: boshqa handlerlardan oldin, bitta tekshiruv bilan
+menu = MenuRouter()
+dp.register_message_handler(menu.dispatch, menu.matches)
+dp.middleware.setup(HandlerTimingMiddleware(resolve=menu.resolve))
+if PROFILE_HANDLERS:
+    dp.middleware.setup(ProfilingMiddleware(resolve=menu.resolve))
+
+@menu.guard("admin")
+async def admin_guard(message: types.Message) -> bool:
+    return admin_registry.is_admin(message.from_user.id)
+
+@menu.guard("main_admin")
+async def main_admin_guard(message: types.Message) -> bool:
+    return message.from_user.id == MAIN_ADMIN_ID
+
+SEARCH_PAGE_SIZE = 8
+
+SERIAL_PAGE_SIZE = 10
+
+def serial_keyboard(video, block: int):
+    parts = video.get("parts", [])
+    video_id = video["_id"]
+    start = block * SERIAL_PAGE_SIZE
+    end = min(start + SERIAL_PAGE_SIZE, len(parts))
+    btns = []
+    row = []
+    for i in range(start, end):
+        row.append(InlineKeyboardButton(text=str(i + 1), callback_data=f"ep_{video_id}_{i}_{i}"))
+        if len(row) == 5:
+            btns.append(row)
+            row = []
+    if row:
+        btns.append(row)
+    if end - start > 1:
+        btns.append([InlineKeyboardButton(
+            text=f"📥 {start + 1}–{end} qismlarni yuborish",
+            callback_data=f"ep_{video_id}_{start}_{end - 1}"
+        )])
+    row = []
+    for b in range((len(parts) + SERIAL_PAGE_SIZE - 1) // SERIAL_PAGE_SIZE):
+        first, last = b * SERIAL_PAGE_SIZE + 1, min((b + 1) * SERIAL_PAGE_SIZE, len(parts))
+        text = f"{first}–{last}" if first != last else str(first)
+        if b == block:
+            text = f"• {text} •"
+        row.append(InlineKeyboardButton(text=text, callback_data=f"epb_{video_id}_{b}"))
+        if len(row) == 4:
+            btns.append(row)
+            row = []
+    if row and len(parts) > SERIAL_PAGE_SIZE:
+        btns.append(row)
+    return InlineKeyboardMarkup(inline_keyboard=btns)
+
+def search_results_keyboard(results, token: str, page: int):
+    start = page * SEARCH_PAGE_SIZE
+    btns = []
+    for video_id, entry in results[start:start + SEARCH_PAGE_SIZE]:
+        icon = '📺' if entry["is_serial"] else '🎥'
+        title = entry["title"] if len(entry["title"]) <= 50 else entry["title"][:49] + "…"
+        btns.append([InlineKeyboardButton(text=f"{icon} {title} ({entry['code']})", callback_data=f"sv_{video_id}")])
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"sp_{token}_{page - 1}"))
+    if start + SEARCH_PAGE_SIZE < len(results):
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"sp_{token}_{page + 1}"))
+    if nav:
+        btns.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=btns)
+
 # ======================================
 # Foydalanuvchi boshqaruvi
 # ======================================
 
-async def add_user(user_id: int, username: str = None):
-    if not users_col.find_one({"user_id": user_id}):
-        users_col.insert_one({"user_id": int(user_id), "username": username})
+def add_user(user_id: int, username: str = None):
+    # Bazaga darhol yozilmaydi: bufer bitta bulk upsert bilan saqlanadi
+    user_registry.touch(user_id, username)
+
+async def count_new_users(new_users: int):
+    stats.add(users=new_users)
+
+user_registry.listeners.append(count_new_users)
 
 async def check_subscription(user_id: int) -> bool:
-    channels = list(channels_col.find({}))
-    if not channels:
-        return True
-    for ch in channels:
+    return await subscriptions.is_subscribed(user_id)
+
+async def insert_video(video, caption=None):
+    # Qo'lda kiritilgan serial kodi bilan to'qnashsa — keyingi kod olinadi
+    while True:
         try:
-            chat_member = await bot.get_chat_member(chat_id=ch['channel_id'], user_id=user_id)
-            if chat_member.status in ['left', 'kicked']:
-                return False
-        except Exception as e:
-            print(f"❌ Kanal tekshirishda xato (ID: {ch.get('channel_id')}): {e}")
-            return False
-    return True
+            await approved_videos_col.insert_one(video)
+            stats.add(videos=1)
+            return
+        except DuplicateKeyError:
+            video["code"] = await code_allocator.next_code()
+            # Standart nom kodni o'z ichiga oladi — u ham yangilanadi
+            video["title"] = caption or f"Kino #{video['code']}"
+
+async def catalog_changed(added=(), removed=(), publish=True):
+    """Shu jarayon indeksi darhol, boshqa workerlar change stream yoki polling orqali yangilanadi"""
+    for video in added:
+        search_index.add(video)
+    for _id in removed:
+        search_index.remove(_id)
+    leaderboard.invalidate()
+    if publish:
+        await search_index.publish()
+
+async def send_video(chat_id: int, video):
+    view_counter.hit(video["_id"])
+    if video.get("is_serial"):
+        parts = video.get("parts", [])
+        await bot.send_message(
+            chat_id,
+            f"📺 {video.get('title', '')}\nQismlar soni: {len(parts)}. Kerakli qismlarni tanlang:",
+            reply_markup=serial_keyboard(video, 0)
+        )
+    else:
+        await bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=video["chat_id"],
+            message_id=video["message_id"]
+        )
+
+async def deliver_parts(chat_id: int, parts, first: int = 0):
+    """Yuborilmagan qismlar raqamlarini (1 dan) qaytaradi"""
+    failed = []
+    numbered = list(enumerate(parts, first + 1))
+    # Bir chatdan o'sish tartibida kelgan qismlar bitta copyMessages bilan yuboriladi
+    for from_chat_id, group in itertools.groupby(numbered, key=lambda p: p[1]["chat_id"]):
+        group = [(number, part["message_id"]) for number, part in group]
+        for i in range(0, len(group), 100):
+            chunk = group[i:i + 100]
+            ids = [message_id for _, message_id in chunk]
+            if len(ids) > 1 and all(x < y for x, y in zip(ids, ids[1:])):
+                try:
+                    await call_with_retry(
+                        bot.request, "copyMessages",
+                        {"chat_id": chat_id, "from_chat_id": from_chat_id, "message_ids": json.dumps(ids)},
+                        limiter=delivery_limiter
+                    )
+                    continue
+                except TelegramAPIError as e:
+                    print(f"copyMessages xato, bittalab yuboramiz: {e}")
+            for number, message_id in chunk:
+                try:
+                    await call_with_retry(
+                        bot.copy_message, chat_id=chat_id, from_chat_id=from_chat_id,
+                        message_id=message_id, limiter=delivery_limiter
+                    )
+                except TelegramAPIError as e:
+                    # Masalan, manba xabari o'chirilgan — qolgan qismlar yuborilaveradi
+                    print(f"{number}-qismni yuborishda xato ({from_chat_id}/{message_id}): {e}")
+                    failed.append(number)
+    return failed
 
 async def send_subscription_request(message: types.Message):
-    channels = list(channels_col.find({}))
+    channels = await subscriptions.channels()
     if not channels:
         return
     text = "Quyidagi kanallarga obuna bo'ling:\n\n"
@@ -141,6 +332,13 @@ async def send_subscription_request(message: types.Message):
     btns.append([InlineKeyboardButton(text="✅ Tekshirish", callback_data="check_sub")])
     await message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=btns))
 
+@menu.guard("subscribed")
+async def subscription_guard(message: types.Message) -> bool:
+    if await check_subscription(message.from_user.id):
+        return True
+    await send_subscription_request(message)
+    return False
+
 # ======================================
 # Boshlang'ich handler
 # ======================================
@@ -149,8 +347,8 @@ async def send_subscription_request(message: types.Message):
 async def start_handler(message: types.Message):
     user_id = message.from_user.id
     username = message.from_user.username
-    await add_user(user_id, username)
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
+    add_user(user_id, username)
+    is_admin = admin_registry.is_admin(user_id)
 
     welcome_text = "Assalomu alaykum! Kino botga xush kelibsiz.\nQuyidagi tugmalardan foydalaning:"
     if is_admin:
@@ -158,9 +356,28 @@ async def start_handler(message: types.Message):
     else:
         await message.answer(welcome_text, reply_markup=main_menu())
 
+    # Inline natijadagi havola: /start v<_id>
+    args = message.get_args() if message.is_command() else ""
+    if args.startswith("v"):
+        await start_deep_link(message, args[1:])
+
+async def start_deep_link(message: types.Message, raw_id: str):
+    if not await check_subscription(message.from_user.id):
+        await send_subscription_request(message)
+        return
+    try:
+        video = await approved_videos_col.find_one({"_id": ObjectId(raw_id)})
+    except InvalidId:
+        video = None
+    if video:
+        await send_video(message.chat.id, video)
+    else:
+        await message.answer("Kino topilmadi!")
+
 @dp.callback_query_handler(lambda c: c.data == "check_sub")
 async def check_sub_callback(callback: types.CallbackQuery):
     user_id = callback.from_user.id
+    subscriptions.invalidate_user(user_id)
     if await check_subscription(user_id):
         await callback.message.edit_text("✅ Obuna tasdiqlandi! Endi botdan foydalanishingiz mumkin.")
         await start_handler(callback.message)
@@ -171,75 +388,160 @@ async def check_sub_callback(callback: types.CallbackQuery):
 # Foydalanuvchi tugmalar (obuna talab qilinadi)
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "🎬 Kino qidirish")
+@menu("🎬 Kino qidirish", role="subscribed")
 async def search_video(message: types.Message):
-    user_id = message.from_user.id
-    if not await check_subscription(user_id):
-        await send_subscription_request(message)
-        return
     await SearchState.searching.set()
     await message.answer("Kino/serial nomi yoki kodini kiriting:", reply_markup=back_button())
 
+async def resolve_search(query: str):
+    """(kino yoki None, natijalar ro'yxati) — tez-tez so'raladiganlari keshdan"""
+    version = search_index.version
+    video_id = search_index.by_code(query)
+    key = f"code:{query}" if video_id else f"title:{normalize(query)}"
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    video = None
+    results = []
+    # Kod bo'yicha tezkor yo'l, keyin nom bo'yicha indeks
+    if video_id:
+        video = await approved_videos_col.find_one({"_id": video_id})
+    else:
+        results = search_index.search(query)
+        if len(results) == 1:
+            video = await approved_videos_col.find_one({"_id": results[0][0]})
+        elif not results:
+            video = await approved_videos_col.find_one({"code": query})
+    search_cache.put(key, (video, results), version)
+    return video, results
+
 @dp.message_handler(state=SearchState.searching, content_types=ContentTypes.ANY)
 async def process_search(message: types.Message, state: FSMContext):
     if message.text == "🔙 Orqaga":
         await state.finish()
-        is_admin = (message.from_user.id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": message.from_user.id}) is not None)
+        is_admin = admin_registry.is_admin(message.from_user.id)
         if is_admin:
             await message.answer("Admin panel:", reply_markup=admin_menu())
         else:
             await message.answer("Asosiy menyu:", reply_markup=main_menu())
         return
-    query = message.text.strip()
-    video = approved_videos_col.find_one({"$or": [{"code": query}, {"title": {"$regex": query, "$options": "i"}}]})
+    query = (message.text or "").strip()
+    video, results = await resolve_search(query) if query else (None, [])
     if video:
-        approved_videos_col.update_one({"_id": video["_id"]}, {"$inc": {"views": 1}})
-        if video.get("is_serial"):
-            parts = video.get("parts", [])
-            for part in parts:
-                await bot.copy_message(
-                    chat_id=message.chat.id,
-                    from_chat_id=part["chat_id"],
-                    message_id=part["message_id"]
-                )
-        else:
-            await bot.copy_message(
-                chat_id=message.chat.id,
-                from_chat_id=video["chat_id"],
-                message_id=video["message_id"]
-            )
+        await send_video(message.chat.id, video)
+    elif results:
+        token = search_index.remember_query(query)
+        await message.answer(
+            f"🔎 Topildi: {len(results)} ta. Keraklisini tanlang:",
+            reply_markup=search_results_keyboard(results, token, 0)
+        )
     else:
         await message.answer("Kino topilmadi!")
     await state.finish()
-    is_admin = (message.from_user.id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": message.from_user.id}) is not None)
+    is_admin = admin_registry.is_admin(message.from_user.id)
     if is_admin:
         await message.answer("Admin panel:", reply_markup=admin_menu())
     else:
         await message.answer("Asosiy menyu:", reply_markup=main_menu())
 
-@dp.message_handler(lambda m: m.text == "🏆 Top kinolar")
-async def top_videos(message: types.Message):
-    user_id = message.from_user.id
-    if not await check_subscription(user_id):
-        await send_subscription_request(message)
+@dp.callback_query_handler(lambda c: c.data.startswith("sp_"))
+async def search_page(callback: types.CallbackQuery):
+    try:
+        _, token, page = callback.data.split("_")
+        page = int(page)
+    except ValueError:
+        await callback.answer("Xato ma'lumot!")
         return
-    top_list = approved_videos_col.find().sort("views", -1).limit(10)
-    text = "🏆 Top 10 kinolar:\n\n"
-    for i, v in enumerate(top_list, 1):
-        title = v.get('title', 'Noma\'lum')
-        code = v.get('code', 'Kod yo\'q')
-        typ = '📺 Serial' if v.get('is_serial') else '🎥 Kino'
-        text += f"{i}. {title} (Kod: {code}) — {typ}\n"
-    if text == "🏆 Top 10 kinolar:\n\n":
-        text = "Hali hech qanday kino qo'shilmagan."
-    await message.answer(text)
+    query = search_index.recall_query(token)
+    if query is None:
+        await callback.answer("Qidiruv eskirgan, qaytadan qidiring.", show_alert=True)
+        return
+    results = search_index.search(query)
+    await callback.message.edit_reply_markup(search_results_keyboard(results, token, page))
+    await callback.answer()
+
+@dp.callback_query_handler(lambda c: c.data.startswith("sv_"))
+async def search_pick(callback: types.CallbackQuery):
+    if not await check_subscription(callback.from_user.id):
+        await send_subscription_request(callback.message)
+        await callback.answer()
+        return
+    try:
+        video_id = ObjectId(callback.data[3:])
+    except InvalidId:
+        await callback.answer("Xato ID!")
+        return
+    video = await approved_videos_col.find_one({"_id": video_id})
+    if not video:
+        await callback.answer("Kino topilmadi!", show_alert=True)
+        return
+    await callback.answer()
+    await send_video(callback.message.chat.id, video)
 
-@dp.message_handler(lambda m: m.text == "📤 Kino yuborish")
-async def send_video_request(message: types.Message):
-    user_id = message.from_user.id
-    if not await check_subscription(user_id):
-        await send_subscription_request(message)
+async def get_serial(callback: types.CallbackQuery, raw_id: str):
+    try:
+        video = await approved_videos_col.find_one({"_id": ObjectId(raw_id), "is_serial": True})
+    except InvalidId:
+        video = None
+    if not video:
+        await callback.answer("Serial topilmadi!", show_alert=True)
+    return video
+
+@dp.callback_query_handler(lambda c: c.data.startswith("epb_"))
+async def serial_block(callback: types.CallbackQuery):
+    try:
+        _, raw_id, block = callback.data.split("_")
+        block = int(block)
+    except ValueError:
+        await callback.answer("Xato ma'lumot!")
         return
+    video = await get_serial(callback, raw_id)
+    if not video:
+        return
+    await callback.message.edit_reply_markup(serial_keyboard(video, block))
+    await callback.answer()
+
+@dp.callback_query_handler(lambda c: c.data.startswith("ep_"))
+async def serial_parts(callback: types.CallbackQuery):
+    if not await check_subscription(callback.from_user.id):
+        await send_subscription_request(callback.message)
+        await callback.answer()
+        return
+    try:
+        _, raw_id, first, last = callback.data.split("_")
+        first, last = int(first), int(last)
+    except ValueError:
+        await callback.answer("Xato ma'lumot!")
+        return
+    video = await get_serial(callback, raw_id)
+    if not video:
+        return
+    parts = video.get("parts", [])[first:last + 1]
+    if not parts:
+        await callback.answer("Qism topilmadi!", show_alert=True)
+        return
+    await callback.answer("📥 Yuborilmoqda...")
+    failed = await deliver_parts(callback.message.chat.id, parts, first)
+    if failed:
+        await bot.send_message(
+            callback.message.chat.id,
+            f"⚠️ Quyidagi qismlarni yuborib bo'lmadi: {', '.join(map(str, failed))}"
+        )
+
+# ======================================
+# Inline qidiruv (@bot nomi)
+# ======================================
+
+@dp.inline_handler()
+async def inline_search_handler(inline_query: types.InlineQuery):
+    await inline_search.answer(inline_query)
+
+@menu("🏆 Top kinolar", role="subscribed")
+async def top_videos(message: types.Message):
+    await message.answer(await leaderboard.text())
+
+@menu("📤 Kino yuborish", role="subscribed")
+async def send_video_request(message: types.Message):
     await UserVideoState.waiting_video.set()
     await message.answer("Kino/serialni shu botga yuboring (video sifatida):", reply_markup=back_button())
 
@@ -247,7 +549,7 @@ async def send_video_request(message: types.Message):
 async def handle_user_video_or_back(message: types.Message, state: FSMContext):
     if message.text == "🔙 Orqaga":
         await state.finish()
-        is_admin = (message.from_user.id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": message.from_user.id}) is not None)
+        is_admin = admin_registry.is_admin(message.from_user.id)
         if is_admin:
             await message.answer("Admin panel:", reply_markup=admin_menu())
         else:
@@ -258,7 +560,7 @@ async def handle_user_video_or_back(message: types.Message, state: FSMContext):
         await message.answer("Faqat video yuboring!")
         return
 
-    pending_videos_col.insert_one({
+    result = await pending_videos_col.insert_one({
         "user_id": message.from_user.id,
         "video_file_id": message.video.file_id,
         "caption": message.caption or "",
@@ -266,42 +568,21 @@ async def handle_user_video_or_back(message: types.Message, state: FSMContext):
         "message_id": message.message_id,
         "status": "pending"
     })
+    stats.add(pending=1)
     await message.answer("✅ Kino adminlarga yuborildi. Tasdiqlansa, botga qo'shiladi.")
 
-    # Adminlarga xabar yuborish
-    try:
-        all_admins = [MAIN_ADMIN_ID]
-        extra_admins = admins_col.find({})
-        for a in extra_admins:
-            uid = a["user_id"]
-            if isinstance(uid, str):
-                uid = int(uid)
-            if uid != MAIN_ADMIN_ID:
-                all_admins.append(uid)
-
-    for admin_id in all_admins:
-        try:
-            # Tugmalar yaratish
-            approve_btn = InlineKeyboardButton("✅ Tasdiqlash", callback_data=f"approve_{message.message_id}_{message.chat.id}")
-            reject_btn = InlineKeyboardButton("❌ Rad etish", callback_data=f"reject_{message.message_id}")
-            keyboard = InlineKeyboardMarkup().add(approve_btn, reject_btn)
-
-            await bot.send_message(
-                admin_id,
-                f"📩 Yangi kino tasdiqlash uchun!\nFoydalanuvchi: {message.from_user.id}",
-                reply_markup=keyboard
-            )
-            await bot.forward_message(admin_id, message.chat.id, message.message_id)
-        except Exception as e:
-            print(f"Admin {admin_id} ga xabar yuborishda xato: {e}")
-        await bot.forward_message(admin_id, message.chat.id, message.message_id)
-    except Exception as e:
-        print(f"Admin {admin_id} ga xabar yuborishda xato: {e}")
-    except Exception as e:
-        print(f"Umumiy xabar yuborish xatosi: {e}")
+    # Adminlarga xabar yuborish (fon vazifasida)
+    approve_btn = InlineKeyboardButton("✅ Tasdiqlash", callback_data=f"approve_{result.inserted_id}")
+    reject_btn = InlineKeyboardButton("❌ Rad etish", callback_data=f"reject_{result.inserted_id}")
+    keyboard = InlineKeyboardMarkup().add(approve_btn, reject_btn)
+    admin_notifier.notify(
+        f"📩 Yangi kino tasdiqlash uchun!\nFoydalanuvchi: {message.from_user.id}",
+        reply_markup=keyboard,
+        forward=(message.chat.id, message.message_id)
+    )
 
     await state.finish()
-    is_admin = (message.from_user.id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": message.from_user.id}) is not None)
+    is_admin = admin_registry.is_admin(message.from_user.id)
     if is_admin:
         await message.answer("Admin panel:", reply_markup=admin_menu())
     else:
@@ -311,7 +592,7 @@ async def handle_user_video_or_back(message: types.Message, state: FSMContext):
 # Ochiq tugmalar (obuna talab qilinmaydi)
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "✍️ Adminga yozish")
+@menu("✍️ Adminga yozish")
 async def contact_admin(message: types.Message):
     await SendMessageToAdmin.waiting_for_message.set()
     await message.answer("Xabaringizni yozing:", reply_markup=back_button())
@@ -320,67 +601,40 @@ async def contact_admin(message: types.Message):
 async def forward_to_admin(message: types.Message, state: FSMContext):
     if message.text == "🔙 Orqaga":
         await state.finish()
-        is_admin = (message.from_user.id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": message.from_user.id}) is not None)
+        is_admin = admin_registry.is_admin(message.from_user.id)
         if is_admin:
             await message.answer("Admin panel:", reply_markup=admin_menu())
         else:
             await message.answer("Asosiy menyu:", reply_markup=main_menu())
         return
     text = f"📩 Yangi xabar:\n\nFoydalanuvchi: {message.from_user.full_name} (@{message.from_user.username or '---'})\nID: {message.from_user.id}\n\nXabar:\n{message.text}"
-    try:
-        all_admins = [MAIN_ADMIN_ID]
-        extra_admins = admins_col.find({})
-        for a in extra_admins:
-            uid = a["user_id"]
-            if isinstance(uid, str):
-                uid = int(uid)
-            if uid != MAIN_ADMIN_ID:
-                all_admins.append(uid)
-        for admin_id in all_admins:
-            try:
-                await bot.send_message(admin_id, text)
-            except Exception as e:
-                print(f"Admin {admin_id} ga xabar yuborishda xato: {e}")
-    except Exception as e:
-        print(f"Xabar yuborishda umumiy xato: {e}")
+    admin_notifier.notify(text)
     await message.answer("✅ Xabaringiz adminlarga yuborildi!")
     await state.finish()
-    is_admin = (message.from_user.id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": message.from_user.id}) is not None)
+    is_admin = admin_registry.is_admin(message.from_user.id)
     if is_admin:
         await message.answer("Admin panel:", reply_markup=admin_menu())
     else:
         await message.answer("Asosiy menyu:", reply_markup=main_menu())
 
-@dp.message_handler(lambda m: m.text == "📊 Statistika")
-async def stats(message: types.Message):
-    total = users_col.count_documents({})
-    videos = approved_videos_col.count_documents({})
-    pending = pending_videos_col.count_documents({"status": "pending"})
-    await message.answer(f"👤 Foydalanuvchilar: {total}\n🎥 Tasdiqlangan kinolar: {videos}\n⏳ Kutayotgan: {pending}")
+@menu("📊 Statistika")
+async def show_stats(message: types.Message):
+    await message.answer(stats.text())
 
 # ======================================
 # Admin panel
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "👑 Admin panel")
+@menu("👑 Admin panel", role="admin", denied="Siz admin emassiz!")
 async def admin_panel(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        await message.answer("Siz admin emassiz!")
-        return
     await message.answer("Admin panel:", reply_markup=admin_menu())
 
 # ======================================
 # Baza kanal
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "📡 Baza kanal")
+@menu("📡 Baza kanal", role="admin")
 async def manage_base_channel(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
     kb = [
         [KeyboardButton(text="➕ Baza kanal qo'shish")],
         [KeyboardButton(text="➖ Baza kanalni olib tashlash")],
@@ -388,43 +642,41 @@ async def manage_base_channel(message: types.Message):
     ]
     await message.answer("Baza kanal boshqaruvi:", reply_markup=ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True))
 
-@dp.message_handler(lambda m: m.text == "➕ Baza kanal qo'shish")
+@menu("➕ Baza kanal qo'shish", role="main_admin")
 async def add_base_channel_start(message: types.Message):
-    if message.from_user.id != MAIN_ADMIN_ID:
-        return
-    await message.answer("Baza kanal ID yoki username yuboring (masalan: @mybasechannel yoki -1001234567890):")
+    await BaseChannelState.waiting_for_channel.set()
+    await message.answer("Baza kanal ID yoki username yuboring (masalan: @mybasechannel yoki -1001234567890):", reply_markup=back_button())
 
-@dp.message_handler(lambda m: m.text.startswith("@") or (m.text.lstrip("-").isdigit() and len(m.text) > 5))
-async def add_base_channel_finish(message: types.Message):
-    if message.from_user.id != MAIN_ADMIN_ID:
+@dp.message_handler(state=BaseChannelState.waiting_for_channel, content_types=ContentTypes.ANY)
+async def add_base_channel_finish(message: types.Message, state: FSMContext):
+    if message.text == "🔙 Orqaga":
+        await state.finish()
+        await manage_base_channel(message)
+        return
+    if message.from_user.id != MAIN_ADMIN_ID or not message.text:
         return
     ch_input = message.text.strip()
     try:
         chat = await bot.get_chat(ch_input)
         channel_id = str(chat.id)
-        set_base_channel(channel_id)
+        await set_base_channel(channel_id)
         await message.answer(f"✅ Baza kanal sozlandi: {chat.title}")
     except Exception as e:
         await message.answer(f"❌ Xatolik: {e}")
+    await state.finish()
+    await manage_base_channel(message)
 
-@dp.message_handler(lambda m: m.text == "➖ Baza kanalni olib tashlash")
+@menu("➖ Baza kanalni olib tashlash", role="main_admin")
 async def remove_base_channel(message: types.Message):
-    if message.from_user.id != MAIN_ADMIN_ID:
-        return
-    settings_col.delete_one({"key": "base_channel"})
+    await settings_col.delete_one({"key": "base_channel"})
     await message.answer("✅ Baza kanal o'chirildi.")
 
 # ======================================
 # Admin kino qo'shish (FSM orqali)
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "🆕 Kino qo'shish")
+@menu("🆕 Kino qo'shish", role="admin", denied="Siz admin emassiz!")
 async def admin_add_movie(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        await message.answer("Siz admin emassiz!")
-        return
     await AddMovieState.waiting_for_movie.set()
     await message.answer("Kino/serialni video sifatida yuboring:", reply_markup=back_button())
 
@@ -440,23 +692,27 @@ async def save_admin_movie(message: types.Message, state: FSMContext):
         return
 
     user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
+    is_admin = admin_registry.is_admin(user_id)
     if not is_admin:
         await message.answer("Siz admin emassiz!")
         await state.finish()
         return
 
-    code = str(approved_videos_col.count_documents({}) + 1).zfill(4)
+    code = await code_allocator.next_code()
     title = message.caption or f"Kino #{code}"
-    approved_videos_col.insert_one({
+    video = {
         "code": code,
         "title": title,
         "chat_id": message.chat.id,
         "message_id": message.message_id,
         "is_serial": False,
         "views": 0
-    })
-    base_channel = get_base_channel()
+    }
+    await insert_video(video, message.caption)
+    code = video["code"]
+    title = video["title"]
+    await catalog_changed(added=[video])
+    base_channel = await get_base_channel()
     if base_channel:
         try:
             await bot.copy_message(
@@ -475,12 +731,8 @@ async def save_admin_movie(message: types.Message, state: FSMContext):
 # Serial qo'shish
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "📺 Serial qo'shish")
+@menu("📺 Serial qo'shish", role="admin")
 async def start_add_serial(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
     await AddSerial.waiting_for_code.set()
     await message.answer("Serial kodini kiriting (masalan: S001):", reply_markup=back_button())
 
@@ -490,7 +742,14 @@ async def serial_code(message: types.Message, state: FSMContext):
         await state.finish()
         await message.answer("Admin panel:", reply_markup=admin_menu())
         return
-    await state.update_data(code=message.text.strip())
+    code = (message.text or "").strip()
+    if not code:
+        await message.answer("Serial kodini matn sifatida kiriting:")
+        return
+    if search_index.by_code(code) or await approved_videos_col.find_one({"code": code}):
+        await message.answer("❌ Bu kod band. Boshqa kod kiriting:")
+        return
+    await state.update_data(code=code)
     await message.answer("Serial nomini kiriting:")
     await AddSerial.waiting_for_title.set()
 
@@ -514,34 +773,10 @@ async def handle_serial_parts_or_finish(message: types.Message, state: FSMContex
     if message.content_type == "text":
         if message.text.strip() == "✅ Yakunlandi":
             data = await state.get_data()
-            parts = data.get("parts", [])
-            if not parts:
+            if not data.get("parts"):
                 await message.answer("Hech qanday qism yuborilmadi!")
                 return
-            code = data["code"]
-            title = data["title"]
-            approved_videos_col.insert_one({
-                "code": code,
-                "title": title,
-                "is_serial": True,
-                "parts": parts,
-                "views": 0
-            })
-            base_channel = get_base_channel()
-            if base_channel:
-                try:
-                    last_part = parts[-1]
-                    await bot.copy_message(
-                        chat_id=base_channel,
-                        from_chat_id=last_part["chat_id"],
-                        message_id=last_part["message_id"],
-                        caption=f"✅ Serial qo'shildi!\n{title}\nKod: {code}"
-                    )
-                except Exception as e:
-                    print(f"Baza kanalga serial xato: {e}")
-            await message.answer(f"✅ Serial qo'shildi!\nKod: {code}")
-            await state.finish()
-            await message.answer("Admin panel:", reply_markup=admin_menu())
+            await finish_serial(message, state)
         else:
             await message.answer("Faqat '✅ Yakunlandi' deb yozing yoki video yuboring.")
     elif message.content_type == "video":
@@ -556,16 +791,65 @@ async def handle_serial_parts_or_finish(message: types.Message, state: FSMContex
     else:
         await message.answer("Faqat video yoki '✅ Yakunlandi' matnini yuboring.")
 
+@dp.message_handler(state=AddSerial.waiting_for_new_code, content_types=ContentTypes.ANY)
+async def serial_new_code(message: types.Message, state: FSMContext):
+    if message.text == "🔙 Orqaga":
+        await state.finish()
+        await message.answer("Admin panel:", reply_markup=admin_menu())
+        return
+    code = (message.text or "").strip()
+    if not code:
+        await message.answer("Serial kodini matn sifatida kiriting:")
+        return
+    if search_index.by_code(code) or await approved_videos_col.find_one({"code": code}):
+        await message.answer("❌ Bu kod band. Boshqa kod kiriting:")
+        return
+    await state.update_data(code=code)
+    await finish_serial(message, state)
+
+async def finish_serial(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    parts = data["parts"]
+    code = data["code"]
+    title = data["title"]
+    video = {
+        "code": code,
+        "title": title,
+        "is_serial": True,
+        "parts": parts,
+        "views": 0
+    }
+    try:
+        await approved_videos_col.insert_one(video)
+    except DuplicateKeyError:
+        # Qismlar yuklanayotganda kodni boshqa admin yoki import egallab qo'ygan
+        await AddSerial.waiting_for_new_code.set()
+        await message.answer(f"❌ {code} kodi band bo'lib qoldi. Qismlar saqlangan — boshqa kod kiriting:")
+        return
+    stats.add(videos=1)
+    await catalog_changed(added=[video])
+    base_channel = await get_base_channel()
+    if base_channel:
+        try:
+            last_part = parts[-1]
+            await bot.copy_message(
+                chat_id=base_channel,
+                from_chat_id=last_part["chat_id"],
+                message_id=last_part["message_id"],
+                caption=f"✅ Serial qo'shildi!\n{title}\nKod: {code}"
+            )
+        except Exception as e:
+            print(f"Baza kanalga serial xato: {e}")
+    await message.answer(f"✅ Serial qo'shildi!\nKod: {code}")
+    await state.finish()
+    await message.answer("Admin panel:", reply_markup=admin_menu())
+
 # ======================================
 # 🗑 KINO O'CHIRISH
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "🗑 Kino o'chirish")
+@menu("🗑 Kino o'chirish", role="admin")
 async def remove_video_start(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
     await RemoveVideoState.waiting_for_code.set()
     await message.answer("O'chirish uchun kino/serial kodini kiriting:", reply_markup=back_button())
 
@@ -576,14 +860,16 @@ async def remove_video_finish(message: types.Message, state: FSMContext):
         await message.answer("Admin panel:", reply_markup=admin_menu())
         return
     code = message.text.strip()
-    video = approved_videos_col.find_one({"code": code})
+    video = await approved_videos_col.find_one({"code": code})
     if not video:
         await message.answer("Bunday kodli kino topilmadi!")
         return
 
-    approved_videos_col.delete_one({"code": code})
+    result = await approved_videos_col.delete_one({"code": code})
+    stats.add(videos=-result.deleted_count)
+    await catalog_changed(removed=[video["_id"]])
 
-    base_channel = get_base_channel()
+    base_channel = await get_base_channel()
     if base_channel:
         try:
             if video.get("is_serial"):
@@ -598,16 +884,182 @@ async def remove_video_finish(message: types.Message, state: FSMContext):
     await state.finish()
     await message.answer("Admin panel:", reply_markup=admin_menu())
 
+# ======================================
+# 📥 Katalog importi (JSONL)
+# ======================================
+
+# Telegram bot orqali yuklab olinadigan fayl chegarasi
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024
+import_tasks = set()
+
+async def index_imported(videos):
+    stats.add(videos=len(videos))
+    # CatalogImporter o'zgarishni boshqa workerlarga o'zi e'lon qiladi
+    await catalog_changed(added=videos, publish=False)
+
+catalog_importer.listeners.append(index_imported)
+
+@menu("📥 Import", role="admin")
+async def import_start(message: types.Message):
+    await ImportState.waiting_for_file.set()
+    await message.answer(
+        "JSONL manifest faylini yuboring. Har bir qator:\n"
+        '{"chat_id": -100..., "message_id": 15, "title": "Nomi", "code": "0150"}\n'
+        'yoki serial: {"title": "Nomi", "parts": [{"chat_id": -100..., "message_id": 40}, ...]}\n'
+        "code ixtiyoriy — berilmasa avtomatik ajratiladi.",
+        reply_markup=back_button()
+    )
+
+@dp.message_handler(state=ImportState.waiting_for_file, content_types=ContentTypes.ANY)
+async def import_file(message: types.Message, state: FSMContext):
+    if message.text == "🔙 Orqaga":
+        await state.finish()
+        await message.answer("Admin panel:", reply_markup=admin_menu())
+        return
+    if not admin_registry.is_admin(message.from_user.id):
+        return
+    if message.content_type != "document":
+        await message.answer("JSONL faylni hujjat sifatida yuboring!")
+        return
+    if message.document.file_size and message.document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.answer("❌ Fayl 20 MB dan katta. Uni bo'lib yuboring yoki `python importer.py` dan foydalaning.")
+        return
+    await state.update_data(import_file_id=message.document.file_id)
+    if not await get_base_channel():
+        await run_import(message, state, mirror=False)
+        return
+    await ImportState.confirm_mirror.set()
+    kb = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="📡 Ha, kanalga ham", callback_data="imp_1"),
+        InlineKeyboardButton(text="Yo'q", callback_data="imp_0"),
+    ]])
+    await message.answer("Import qilingan kinolar baza kanalga ham joylansinmi?", reply_markup=kb)
+
+@dp.callback_query_handler(lambda c: c.data in ("imp_0", "imp_1"), state=ImportState.confirm_mirror)
+async def import_confirm(callback: types.CallbackQuery, state: FSMContext):
+    await callback.answer()
+    await callback.message.edit_reply_markup()
+    await run_import(callback.message, state, mirror=callback.data == "imp_1")
+
+async def run_import(message: types.Message, state: FSMContext, mirror: bool):
+    file_id = (await state.get_data()).get("import_file_id")
+    await state.finish()
+    await message.answer("Admin panel:", reply_markup=admin_menu())
+    status = await message.answer("⏳ Import boshlandi...")
+    task = asyncio.create_task(import_in_background(status, file_id, mirror))
+    import_tasks.add(task)
+    task.add_done_callback(import_tasks.discard)
+
+async def import_in_background(status: types.Message, file_id: str, mirror: bool):
+    async def progress(report):
+        try:
+            await status.edit_text(f"⏳ Import davom etmoqda...\n\n{report.text()}")
+        except TelegramAPIError:
+            pass
+
+    try:
+        buffer = await bot.download_file_by_id(file_id)
+        base_channel = await get_base_channel() if mirror else None
+        report = await catalog_importer.run(buffer.getvalue().splitlines(), base_channel=base_channel, progress=progress)
+    except Exception as e:
+        print(f"Import xato: {e}")
+        await status.edit_text(f"❌ Import to'xtadi: {e}")
+        return
+    text = f"📥 Import yakunlandi.\n\n{report.text()}"
+    if base_channel and report.inserted:
+        text += "\n\n📡 Baza kanalga joylash navbatga qo'yildi."
+    await status.edit_text(text)
+
+# ======================================
+# 💾 Eksport (zaxira nusxa)
+# ======================================
+
+# Bot API orqali yuborish mumkin bo'lgan hujjat hajmi
+EXPORT_MAX_SEND_SIZE = 49 * 1024 * 1024
+EXPORT_KEEP_FILES = os.getenv("EXPORT_KEEP_FILES", "0") == "1"
+export_tasks = set()
+
+def export_keyboard():
+    btns = [
+        [InlineKeyboardButton(text="📦 Katalog JSONL", callback_data="exp_catalog_jsonl_full"),
+         InlineKeyboardButton(text="📦 Katalog CSV", callback_data="exp_catalog_csv_full")],
+        [InlineKeyboardButton(text="👤 Foydalanuvchilar JSONL", callback_data="exp_users_jsonl_full"),
+         InlineKeyboardButton(text="👤 Foydalanuvchilar CSV", callback_data="exp_users_csv_full")],
+        [InlineKeyboardButton(text="🔁 Katalog (yangilari)", callback_data="exp_catalog_jsonl_inc"),
+         InlineKeyboardButton(text="🔁 Foydalanuvchilar (yangilari)", callback_data="exp_users_jsonl_inc")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=btns)
+
+@menu("💾 Eksport", role="main_admin")
+async def export_menu(message: types.Message):
+    await message.answer(
+        "Eksport turini tanlang. \"Yangilari\" — oxirgi \"Yangilari\" eksportidan keyin qo'shilganlar.\n"
+        "Ma'lum ID dan boshlash: /export catalog jsonl <ObjectId>",
+        reply_markup=export_keyboard()
+    )
+
+@dp.message_handler(commands=["export"], state="*")
+async def export_command(message: types.Message):
+    if message.from_user.id != MAIN_ADMIN_ID:
+        return
+    args = message.get_args().split()
+    if not args or args[0] not in ("catalog", "users"):
+        await message.answer("Foydalanish: /export <catalog|users> [jsonl|csv] [ObjectId]")
+        return
+    fmt = args[1] if len(args) > 1 else "jsonl"
+    if fmt not in ("jsonl", "csv"):
+        await message.answer("Format: jsonl yoki csv")
+        return
+    since = None
+    if len(args) > 2:
+        try:
+            since = ObjectId(args[2])
+        except InvalidId:
+            await message.answer("❌ ObjectId noto'g'ri.")
+            return
+    start_export(message.chat.id, args[0], fmt, since)
+
+@dp.callback_query_handler(lambda c: c.data.startswith("exp_"), state="*")
+async def export_callback(callback: types.CallbackQuery):
+    if callback.from_user.id != MAIN_ADMIN_ID:
+        await callback.answer("Faqat asosiy admin uchun!", show_alert=True)
+        return
+    _, name, fmt, mode = callback.data.split("_")
+    await callback.answer("⏳ Eksport boshlandi...")
+    start_export(callback.message.chat.id, name, fmt, incremental=mode == "inc")
+
+def start_export(chat_id: int, name: str, fmt: str, since=None, incremental=False):
+    task = asyncio.create_task(export_in_background(chat_id, name, fmt, since, incremental))
+    export_tasks.add(task)
+    task.add_done_callback(export_tasks.discard)
+
+async def export_in_background(chat_id: int, name: str, fmt: str, since, incremental):
+    try:
+        path, count, last_id = await exporter.export(name, fmt, since=since, incremental=incremental)
+    except Exception as e:
+        print(f"Eksport xato: {e}")
+        await bot.send_message(chat_id, f"❌ Eksport to'xtadi: {e}")
+        return
+    caption = f"💾 {name}: {count} ta yozuv"
+    if last_id:
+        caption += f"\nOxirgi ID: {last_id}"
+    if os.path.getsize(path) > EXPORT_MAX_SEND_SIZE:
+        await bot.send_message(chat_id, f"{caption}\n\nFayl katta, serverda saqlandi: {path}")
+        return
+    try:
+        await bot.send_document(chat_id, InputFile(path, filename=os.path.basename(path)), caption=caption)
+    except TelegramAPIError as e:
+        await bot.send_message(chat_id, f"{caption}\n\nYuborib bo'lmadi ({e}), serverda saqlandi: {path}")
+        return
+    if not EXPORT_KEEP_FILES:
+        os.remove(path)
+
 # ======================================
 # Xabar yuborish (broadcast)
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "📢 Xabar yuborish")
+@menu("📢 Xabar yuborish", role="admin")
 async def broadcast_start(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
     await BroadcastMessage.waiting_for_message.set()
     await message.answer("Xabarni yozing (matn, video, rasm — istalgan formatda):", reply_markup=back_button())
 
@@ -617,32 +1069,31 @@ async def do_broadcast(message: types.Message, state: FSMContext):
         await state.finish()
         await message.answer("Admin panel:", reply_markup=admin_menu())
         return
-    users = users_col.find({})
-    sent = 0
-    for user in users:
-        try:
-            await bot.copy_message(
-                chat_id=user["user_id"],
-                from_chat_id=message.chat.id,
-                message_id=message.message_id
-            )
-            sent += 1
-        except Exception as e:
-            print(f"Broadcast xato: {e}")
-    await message.answer(f"✅ Xabar {sent} foydalanuvchiga yuborildi.")
+    await broadcaster.start(message.chat.id, message.message_id, message.chat.id)
     await state.finish()
     await message.answer("Admin panel:", reply_markup=admin_menu())
 
+@dp.callback_query_handler(lambda c: c.data.startswith("bc_stop_"))
+async def broadcast_stop(callback: types.CallbackQuery):
+    if not admin_registry.is_admin(callback.from_user.id):
+        await callback.answer()
+        return
+    try:
+        job_id = ObjectId(callback.data.replace("bc_stop_", ""))
+    except InvalidId:
+        await callback.answer("Xato ID!")
+        return
+    if await broadcaster.cancel(job_id):
+        await callback.answer("⏹ To'xtatilmoqda...")
+    else:
+        await callback.answer("Bu xabar yuborish allaqachon tugagan.", show_alert=True)
+
 # ======================================
 # Majburiy kanallar
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "🔍 Majburiy kanallar")
+@menu("🔍 Majburiy kanallar", role="admin")
 async def manage_channels(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
     kb = [
         [KeyboardButton(text="➕ Kanal qo'shish")],
         [KeyboardButton(text="➖ Kanalni olib tashlash")],
@@ -650,12 +1101,8 @@ async def manage_channels(message: types.Message):
     ]
     await message.answer("Kanallar boshqaruvi:", reply_markup=ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True))
 
-@dp.message_handler(lambda m: m.text == "➕ Kanal qo'shish")
+@menu("➕ Kanal qo'shish", role="admin")
 async def add_channel_start(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
     await AddChannel.waiting_for_channel.set()
     await message.answer("Kanal linkini yoki ID sini yuboring (masalan: @mychannel yoki -1001234567890):")
 
@@ -666,7 +1113,7 @@ async def add_channel_finish(message: types.Message, state: FSMContext):
         await manage_channels(message)
         return
     user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
+    is_admin = admin_registry.is_admin(user_id)
     if not is_admin:
         return
     ch_input = message.text.strip()
@@ -675,24 +1122,21 @@ async def add_channel_finish(message: types.Message, state: FSMContext):
         channel_id = str(chat.id)
         title = chat.title or ch_input
         link = f"https://t.me/{chat.username}" if chat.username else ch_input  # ✅ tuzatildi!
-        channels_col.update_one(
+        await channels_col.update_one(
             {"channel_id": channel_id},
             {"$set": {"title": title, "link": link}},
             upsert=True
         )
+        subscriptions.invalidate_channels()
         await message.answer(f"✅ Kanal qo'shildi: {title}")
     except Exception as e:
         await message.answer(f"❌ Xatolik: {e}")
     await state.finish()
     await manage_channels(message)
 
-@dp.message_handler(lambda m: m.text == "📋 Ro'yxat")
+@menu("📋 Ro'yxat", role="admin")
 async def list_channels(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
-    channels = list(channels_col.find({}))
+    channels = await channels_col.find_list({})
     if not channels:
         await message.answer("Hech qanday majburiy kanal qo'shilmagan.")
         return
@@ -703,13 +1147,9 @@ async def list_channels(message: types.Message):
         text += f"• {title} — {link}\n"
     await message.answer(text)
 
-@dp.message_handler(lambda m: m.text == "➖ Kanalni olib tashlash")
+@menu("➖ Kanalni olib tashlash", role="admin")
 async def remove_channel_start(message: types.Message):
-    user_id = message.from_user.id
-    is_admin = (user_id == MAIN_ADMIN_ID) or (admins_col.find_one({"user_id": user_id}) is not None)
-    if not is_admin:
-        return
-    channels = list(channels_col.find({}))
+    channels = await channels_col.find_list({})
     if not channels:
         await message.answer("Hech qanday kanal yo'q.")
         return
@@ -723,7 +1163,8 @@ async def remove_channel_start(message: types.Message):
 @dp.callback_query_handler(lambda c: c.data.startswith("del_channel_"))
 async def delete_channel(callback: types.CallbackQuery):
     channel_id = callback.data.replace("del_channel_", "")
-    result = channels_col.delete_one({"channel_id": channel_id})
+    result = await channels_col.delete_one({"channel_id": channel_id})
+    subscriptions.invalidate_channels()
     if result.deleted_count:
         await callback.message.edit_text("✅ Kanal o'chirildi.")
     else:
@@ -738,10 +1179,8 @@ async def cancel_delete(callback: types.CallbackQuery):
 # Admin boshqaruvi
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "👑 Admin qo'shish")
+@menu("👑 Admin qo'shish", role="main_admin")
 async def add_admin_start(message: types.Message):
-    if message.from_user.id != MAIN_ADMIN_ID:
-        return
     await AddAdmin.waiting_for_id.set()
     await message.answer("Yangi admin ID raqamini yuboring:")
 
@@ -755,20 +1194,17 @@ async def add_admin_finish(message: types.Message, state: FSMContext):
         new_admin_id = int(message.text.strip())
         if new_admin_id == MAIN_ADMIN_ID:
             await message.answer("❌ Bu ID asosiy admin!")
-        elif admins_col.find_one({"user_id": new_admin_id}):
+        elif not await admin_registry.add(new_admin_id):
             await message.answer("❌ Bu foydalanuvchi allaqachon admin!")
         else:
-            admins_col.insert_one({"user_id": new_admin_id})
             await message.answer(f"✅ Foydalanuvchi {new_admin_id} admin qilindi!")
     except ValueError:
         await message.answer("❌ ID faqat raqam bo'lishi kerak. Qaytadan urinib ko'ring.")
     await state.finish()
     await message.answer("Admin panel:", reply_markup=admin_menu())
 
-@dp.message_handler(lambda m: m.text == "🗑 Admin o'chirish")
+@menu("🗑 Admin o'chirish", role="main_admin")
 async def remove_admin_start(message: types.Message):
-    if message.from_user.id != MAIN_ADMIN_ID:
-        return
     await RemoveAdmin.waiting_for_id.set()
     await message.answer("O'chiriladigan admin ID raqamini yuboring:")
 
@@ -783,8 +1219,7 @@ async def remove_admin_finish(message: types.Message, state: FSMContext):
         if admin_id_to_remove == MAIN_ADMIN_ID:
             await message.answer("❌ Asosiy adminni o'chirib bo'lmaydi!")
         else:
-            result = admins_col.delete_one({"user_id": admin_id_to_remove})
-            if result.deleted_count > 0:
+            if await admin_registry.remove(admin_id_to_remove):
                 await message.answer(f"✅ Foydalanuvchi {admin_id_to_remove} adminlikdan chiqarildi.")
             else:
                 await message.answer("❌ Bunday admin topilmadi.")
@@ -793,95 +1228,183 @@ async def remove_admin_finish(message: types.Message, state: FSMContext):
     await state.finish()
     await message.answer("Admin panel:", reply_markup=admin_menu())
 
-@dp.message_handler(lambda m: m.text == "📋 Adminlar")
+@menu("📋 Adminlar", role="main_admin")
 async def list_admins(message: types.Message):
-    if message.from_user.id != MAIN_ADMIN_ID:
-        return
-    admins = admins_col.find({})
+    admins = admin_registry.extra()
     text = "👑 Qo'shimcha adminlar:\n\n"
-    count = 0
-    for admin in admins:
-        text += f"• {admin['user_id']}\n"
-        count += 1
-    if count == 0:
+    for admin_id in admins:
+        text += f"• {admin_id}\n"
+    if not admins:
         text = "Hozircha qo'shimcha adminlar yo'q."
     await message.answer(text)
 # ======================================
 # ✅ Tasdiqlash / ❌ Rad etish
 # ======================================
 
-@dp.callback_query_handler(lambda c: c.data.startswith("approve_"))
+async def approve_pending(ids) -> int:
+    approved = await moderation.approve(ids)
+    if not approved:
+        return 0
+    stats.add(videos=len(approved), pending=-len(approved))
+    await catalog_changed(added=[video for _, video in approved])
+    user_notifier.send_texts([
+        (doc["user_id"], f"✅ Siz yuborgan kino tasdiqlandi!\nKod: {video['code']}") for doc, video in approved
+    ])
+    base_channel = await get_base_channel()
+    if base_channel:
+        # Kanalga ~20 xabar/daqiqa — MirrorQueue navbat orqali asta-sekin joylaydi
+        await mirror_col.insert_many([mirror_job(video, base_channel) for _, video in approved])
+    return len(approved)
+
+async def reject_pending(ids) -> int:
+    rejected = await moderation.reject(ids)
+    stats.add(pending=-len(rejected))
+    user_notifier.send_texts([(doc["user_id"], "❌ Siz yuborgan kino rad etildi.") for doc in rejected])
+    return len(rejected)
+
+def parse_ids(raw_ids):
+    try:
+        return [ObjectId(raw) for raw in raw_ids]
+    except (InvalidId, TypeError):
+        return None
+
+@dp.callback_query_handler(lambda c: c.data.startswith("approve_"), state="*")
 async def approve_video(callback: types.CallbackQuery):
-    parts = callback.data.split("_")
-    if len(parts) < 3:
-        await callback.answer("Xato ma'lumot!")
+    if not admin_registry.is_admin(callback.from_user.id):
+        await callback.answer("Siz admin emassiz!", show_alert=True)
         return
-    try:
-        message_id = int(parts[1])
-        chat_id = int(parts[2])
-    except:
-        await callback.answer("Xato ID!")
+    ids = parse_ids([callback.data[len("approve_"):]])
+    if not ids:
+        await callback.answer("Eskirgan tugma — 🗂 Moderatsiya bo'limidan foydalaning.", show_alert=True)
         return
+    if await approve_pending(ids):
+        await callback.message.edit_text("✅ Kino tasdiqlandi!")
+    else:
+        await callback.message.edit_text("❌ Video topilmadi yoki allaqachon ko'rib chiqilgan.")
 
-    video_data = pending_videos_col.find_one({
-        "message_id": message_id,
-        "chat_id": chat_id
-    })
-    if not video_
-        await callback.message.edit_text("❌ Video topilmadi yoki allaqachon tasdiqlangan.")
+@dp.callback_query_handler(lambda c: c.data.startswith("reject_"), state="*")
+async def reject_video(callback: types.CallbackQuery):
+    if not admin_registry.is_admin(callback.from_user.id):
+        await callback.answer("Siz admin emassiz!", show_alert=True)
         return
+    ids = parse_ids([callback.data[len("reject_"):]])
+    if not ids:
+        await callback.answer("Eskirgan tugma — 🗂 Moderatsiya bo'limidan foydalaning.", show_alert=True)
+        return
+    await reject_pending(ids)
+    await callback.message.edit_text("❌ Kino rad etildi.")
 
-    code = str(approved_videos_col.count_documents({}) + 1).zfill(4)
-    approved_videos_col.insert_one({
-        "code": code,
-        "title": video_data.get("caption", f"Kino #{code}"),
-        "chat_id": video_data["chat_id"],
-        "message_id": video_data["message_id"],
-        "is_serial": False,
-        "views": 0
-    })
-
-    try:
-        await bot.send_message(video_data["user_id"], f"✅ Siz yuborgan kino tasdiqlandi!\nKod: {code}")
-    except:
-        pass
-
-    base_channel = get_base_channel()
-    if base_channel:
-        try:
-            await bot.copy_message(
-                chat_id=base_channel,
-                from_chat_id=video_data["chat_id"],
-                message_id=video_data["message_id"],
-                caption=f"✅ {video_data.get('caption', 'Kino')}\n\nKod: {code}"
-            )
-        except Exception as e:
-            print(f"Baza kanalga xato: {e}")
-
-    pending_videos_col.delete_one({"_id": video_data["_id"]})
-    await callback.message.edit_text("✅ Kino tasdiqlandi!")
+# ======================================
+# 🗂 Moderatsiya navbati (ommaviy tasdiqlash)
+# ======================================
 
-@dp.callback_query_handler(lambda c: c.data.startswith("reject_"))
-async def reject_video(callback: types.CallbackQuery):
+def moderation_view(docs, total: int, page: int, selected):
+    pages = max((total + moderation.page_size - 1) // moderation.page_size, 1)
+    if not docs:
+        return "✅ Moderatsiya navbati bo'sh.", None
+    start = page * moderation.page_size
+    lines = [f"🗂 Kutayotgan videolar: {total} ta (sahifa {page + 1}/{pages})\n"]
+    btns = []
+    for number, doc in enumerate(docs, start + 1):
+        caption = (doc.get("caption") or "Nomsiz").replace("\n", " ")
+        caption = caption if len(caption) <= 40 else caption[:39] + "…"
+        lines.append(f"{number}. {caption} — {doc['user_id']}")
+        mark = "☑️" if str(doc["_id"]) in selected else "⬜"
+        btns.append([
+            InlineKeyboardButton(text=f"{mark} {number}. {caption}", callback_data=f"mt_{page}_{doc['_id']}"),
+            InlineKeyboardButton(text="👁", callback_data=f"mv_{doc['_id']}"),
+        ])
+    btns.append([InlineKeyboardButton(text="☑️ Sahifani belgilash", callback_data=f"mall_{page}")])
+    btns.append([
+        InlineKeyboardButton(text=f"✅ Tasdiqlash ({len(selected)})", callback_data=f"ma_{page}"),
+        InlineKeyboardButton(text=f"❌ Rad etish ({len(selected)})", callback_data=f"mr_{page}"),
+    ])
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"mp_{page - 1}"))
+    if page + 1 < pages:
+        nav.append(InlineKeyboardButton(text="➡️", callback_data=f"mp_{page + 1}"))
+    if nav:
+        btns.append(nav)
+    return "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=btns)
+
+async def show_moderation_page(callback: types.CallbackQuery, state: FSMContext, page: int):
+    docs, total = await moderation.page(page)
+    if not docs and page > 0:
+        # Oxirgi sahifa bo'shab qolgan bo'lsa — oldingisiga
+        page = max((total - 1) // moderation.page_size, 0)
+        docs, total = await moderation.page(page)
+    selected = set((await state.get_data()).get("mod_selected", []))
+    text, keyboard = moderation_view(docs, total, page, selected)
     try:
-        message_id = int(callback.data.split("_")[1])
-    except:
-        await callback.answer("Xato ID!")
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramAPIError:
+        pass  # matn o'zgarmagan
+
+@menu("🗂 Moderatsiya", role="admin")
+async def moderation_start(message: types.Message, state: FSMContext):
+    await state.update_data(mod_selected=[])
+    docs, total = await moderation.page(0)
+    text, keyboard = moderation_view(docs, total, 0, set())
+    await message.answer(text, reply_markup=keyboard)
+
+@dp.callback_query_handler(lambda c: c.data.startswith(("mp_", "mt_", "mall_", "ma_", "mr_", "mv_")), state="*")
+async def moderation_action(callback: types.CallbackQuery, state: FSMContext):
+    if not admin_registry.is_admin(callback.from_user.id):
+        await callback.answer("Siz admin emassiz!", show_alert=True)
+        return
+    action, _, rest = callback.data.partition("_")
+    if action == "mv":
+        ids = parse_ids([rest])
+        doc = ids and await pending_videos_col.find_one({"_id": ids[0]})
+        if not doc:
+            await callback.answer("Video topilmadi!", show_alert=True)
+            return
+        await callback.answer()
+        await bot.copy_message(callback.message.chat.id, doc["chat_id"], doc["message_id"])
+        return
+    page_raw, _, raw_id = rest.partition("_")
+    if not page_raw.isdigit():
+        await callback.answer("Xato ma'lumot!")
         return
+    page = int(page_raw)
+    selected = (await state.get_data()).get("mod_selected", [])
+
+    if action == "mt":
+        if raw_id in selected:
+            selected.remove(raw_id)
+        elif parse_ids([raw_id]):
+            selected.append(raw_id)
+        await state.update_data(mod_selected=selected)
+        await callback.answer()
+    elif action == "mall":
+        docs, _ = await moderation.page(page)
+        page_ids = [str(doc["_id"]) for doc in docs]
+        if all(raw in selected for raw in page_ids):
+            selected = [raw for raw in selected if raw not in page_ids]
+        else:
+            selected += [raw for raw in page_ids if raw not in selected]
+        await state.update_data(mod_selected=selected)
+        await callback.answer()
+    elif action in ("ma", "mr"):
+        if not selected:
+            await callback.answer("Avval videolarni belgilang.", show_alert=True)
+            return
+        ids = parse_ids(selected)
+        if action == "ma":
+            count = await approve_pending(ids)
+            await callback.answer(f"✅ {count} ta kino tasdiqlandi.")
+        else:
+            count = await reject_pending(ids)
+            await callback.answer(f"❌ {count} ta kino rad etildi.")
+        await state.update_data(mod_selected=[])
+    await show_moderation_page(callback, state, page)
 
-    video_data = pending_videos_col.find_one({"message_id": message_id})
-    if video_
-        pending_videos_col.delete_one({"_id": video_data["_id"]})
-        try:
-            await bot.send_message(video_data["user_id"], "❌ Siz yuborgan kino rad etildi.")
-        except:
-            pass
-    await callback.message.edit_text("❌ Kino rad etildi.")
 # ======================================
 # Umumiy "Orqaga"
 # ======================================
 
-@dp.message_handler(lambda m: m.text == "🔙 Orqaga")
+@menu("🔙 Orqaga")
 async def go_back(message: types.Message, state: FSMContext):
     current_state = await state.get_state()
     if current_state:
@@ -890,28 +1413,185 @@ async def go_back(message: types.Message, state: FSMContext):
     await message.answer("Asosiy menyu:", reply_markup=main_menu())
 
 # ======================================
-# Flask + Aiogram
+# Server: webhook yoki polling (bitta event loop)
 # ======================================
 
-flask_app = Flask(__name__)
-
-@flask_app.route('/health')
-def health():
-    return "OK", 200
-
-def start_bot():
-    import asyncio
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    from aiogram import executor
+# polling — standart; webhook — WEBHOOK_URL orqali Telegram o'zi yuboradi
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Bir vaqtda ishlanayotgan update'lar chegarasi (undan oshsa Telegram kutadi)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "256"))
+
+update_slots = asyncio.Semaphore(UPDATE_CONCURRENCY)
+update_tasks = set()
+
+Gauge("bot_updates_in_flight", "Hozir ishlanayotgan update'lar", fn=lambda: len(update_tasks))
+Gauge("bot_broadcast_active_jobs", "Shu jarayonda ishlayotgan broadcastlar", fn=lambda: len(broadcaster.active))
+Gauge("bot_notifications_pending", "Fonda yuborilayotgan xabarnomalar",
+      fn=lambda: len(admin_notifier._tasks) + len(user_notifier._tasks))
+
+async def process_update(update: types.Update):
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
     try:
-        loop.run_until_complete(executor.start_polling(dp, skip_updates=True))
+        await dp.process_update(update)
     except Exception as e:
-        print(f"Aiogram xatosi: {e}")
+        print(f"Update {update.update_id} ishlashda xato: {e}")
+    finally:
+        update_slots.release()
+
+async def dispatch_update(update: types.Update):
+    await update_slots.acquire()
+    task = asyncio.create_task(process_update(update))
+    update_tasks.add(task)
+    task.add_done_callback(update_tasks.discard)
+
+async def webhook_handler(request: web.Request):
+    if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        return web.Response(status=403)
+    # Darhol javob qaytaramiz, update esa fonda parallel ishlanadi
+    await dispatch_update(types.Update(**(await request.json())))
+    return web.Response(text="ok")
+
+async def health(request: web.Request):
+    return web.Response(text="OK")
+
+async def metrics_handler(request: web.Request):
+    return web.Response(body=metrics.render().encode(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+# Doimiy fon sikllari — to'xtashda bekor qilinib, oxirgi flush'dan oldin kutiladi
+background_tasks = []
+
+def start_background(coro):
+    background_tasks.append(asyncio.create_task(coro))
+
+async def stop_background():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+async def on_startup(dp, consumers=True):
+    """consumers — Mongo navbatlari (kanal navbati, broadcast lease'lari) shu jarayonda o'qiladimi"""
+    await admin_registry.load()
+    start_background(admin_registry.run())
+    await search_index.load()
+    start_background(search_index.run())
+    start_background(view_counter.run())
+    start_background(user_registry.run())
+    await leaderboard.load()
+    start_background(leaderboard.run())
+    await stats.load()
+    start_background(stats.run())
+    start_background(metrics.watch_loop_lag())
+    if consumers:
+        # Bir nechta workerda ham bitta iste'molchi: kanal tezligi WORKERS marta oshib ketmaydi
+        start_background(mirror_queue.run())
+        start_background(broadcaster.run())
+
+async def on_shutdown(dp):
+    await stop_background()
+    # Yig'ilgan ko'rishlar va yangi foydalanuvchilar yo'qolmasligi uchun
+    await view_counter.flush()
+    await user_registry.flush()
+    await broadcaster.release()
+    await admin_notifier.drain()
+    await user_notifier.drain()
+
+async def start_app(app: web.Application):
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+    await on_startup(dp)
+    if BOT_MODE == "webhook":
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            drop_pending_updates=True,
+            max_connections=100,
+            secret_token=WEBHOOK_SECRET or None
+        )
+    else:
+        await dp.skip_updates()
+        app["polling"] = asyncio.create_task(dp.start_polling())
+
+async def stop_app(app: web.Application):
+    if "polling" in app:
+        dp.stop_polling()
+        await dp.wait_closed()
+    if update_tasks:
+        await asyncio.wait(update_tasks, timeout=30)
+    await on_shutdown(dp)
+    await dp.storage.close()
+    await (await bot.get_session()).close()
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_handler)
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("BOT_MODE=webhook uchun WEBHOOK_URL kerak!")
+        app.router.add_post(WEBHOOK_PATH, webhook_handler)
+    app.on_startup.append(start_app)
+    app.on_shutdown.append(stop_app)
+    return app
+
+# ======================================
+# Supervisor rejimi: WORKERS > 1 bo'lsa update'lar user_id bo'yicha
+# alohida jarayonlarga taqsimlanadi
+# ======================================
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Berilsa, har bir worker o'z metrikalarini shu port + index da ko'rsatadi
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+async def worker_main(index: int, queue):
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+    # Bot API budjeti bitta token uchun — workerlar o'rtasida teng bo'linadi
+    bot_limiter.set_rate(BOT_RATE / WORKERS)
+    # Navbat iste'molchilari faqat 0-workerda; u o'lsa supervisor qayta ishga tushiradi
+    await on_startup(dp, consumers=index == 0)
+    if WORKER_METRICS_PORT:
+        metrics_app = web.Application()
+        metrics_app.router.add_get("/metrics", metrics_handler)
+        runner = web.AppRunner(metrics_app)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", WORKER_METRICS_PORT + index).start()
+    loop = asyncio.get_running_loop()
+    parent = os.getppid()
+    while True:
+        try:
+            data = await loop.run_in_executor(None, queue.get, True, 1)
+        except Empty:
+            if os.getppid() != parent:  # supervisor o'lgan
+                break
+            continue
+        if data is None:
+            break
+        await dispatch_update(types.Update(**data))
+    if update_tasks:
+        await asyncio.wait(update_tasks, timeout=30)
+    await on_shutdown(dp)
+    await dp.storage.close()
+    await (await bot.get_session()).close()
+
+def run_worker(index: int, queue):
+    # To'xtatishni supervisor boshqaradi (navbatga None yuboradi)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(worker_main(index, queue))
 
 if __name__ == "__main__":
-    threading.Thread(target=start_bot, daemon=True).start()
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
     port = int(os.environ.get("PORT", 10000))
-    flask_app.run(host="0.0.0.0", port=port)
+    if WORKERS > 1:
+        if BOT_MODE == "webhook" and not WEBHOOK_URL:
+            raise ValueError("BOT_MODE=webhook uchun WEBHOOK_URL kerak!")
+        app = Supervisor(bot, WORKERS, run_worker).create_app(BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET)
+    else:
+        app = create_app()
+    web.run_app(app, host="0.0.0.0", port=port)
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.exceptions import ChatNotFound, TelegramAPIError, Unauthorized
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from ratelimit import RateLimiter, bot_limiter, call_with_retry
+
+# Umumiy BOT_RATE budjetidan broadcast ulushi: qolgani xabarnomalar va qismlar uchun
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "15"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+# Checkpoint oralig'i: qayta ishga tushganda ko'pi bilan shuncha xabar takrorlanadi
+BROADCAST_BATCH = int(os.getenv("BROADCAST_BATCH", "100"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+# Worker to'xtab qolsa, shu vaqtdan keyin boshqasi vazifani davom ettiradi
+LEASE_SECONDS = 120
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def progress_text(job) -> str:
+    done = job["sent"] + job["blocked"] + job["failed"]
+    total = max(job.get("total") or 0, done)
+    head = {
+        "running": "📢 Xabar yuborilmoqda...",
+        "done": "✅ Xabar yuborish yakunlandi.",
+        "cancelled": "⏹ Xabar yuborish to'xtatildi.",
+    }[job["status"]]
+    return (
+        f"{head}\n\n"
+        f"Jarayon: {done}/{total}\n"
+        f"✅ Yuborildi: {job['sent']}\n"
+        f"🚫 Bloklagan: {job['blocked']}\n"
+        f"❌ Xato: {job['failed']}"
+    )
+
+
+def stop_keyboard(job_id):
+    btn = InlineKeyboardButton(text="⏹ To'xtatish", callback_data=f"bc_stop_{job_id}")
+    return InlineKeyboardMarkup(inline_keyboard=[[btn]])
+
+
+class Broadcaster:
+    """Qayta tiklanadigan ommaviy xabar yuborish. Holat broadcasts kolleksiyasida saqlanadi."""
+
+    def __init__(self, bot, users_col, jobs_col, rate=BROADCAST_RATE,
+                 concurrency=BROADCAST_CONCURRENCY, batch_size=BROADCAST_BATCH):
+        self.bot = bot
+        self.users_col = users_col
+        self.jobs_col = jobs_col
+        self.limiter = RateLimiter(rate, parent=bot_limiter)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.active = {}  # job_id -> task
+        # Shu jarayonning lease egasi belgisi: lease boshqaga o'tgach yuborish to'xtaydi
+        self.owner = ObjectId()
+
+    async def start(self, from_chat_id: int, message_id: int, admin_chat_id: int):
+        total = await self.users_col.estimated_document_count()
+        job = {
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+            "admin_chat_id": admin_chat_id,
+            "status": "running",
+            "checkpoint": None,  # oxirgi ishlangan users._id
+            "total": total,
+            "sent": 0,
+            "blocked": 0,
+            "failed": 0,
+            "created_at": _now(),
+            "lease_until": _now() + timedelta(seconds=LEASE_SECONDS),
+            "lease_owner": self.owner,
+        }
+        await self.jobs_col.insert_one(job)
+        progress = await self.bot.send_message(
+            admin_chat_id, progress_text(job), reply_markup=stop_keyboard(job["_id"])
+        )
+        job["progress_message_id"] = progress.message_id
+        await self.jobs_col.update_one(
+            {"_id": job["_id"]}, {"$set": {"progress_message_id": progress.message_id}}
+        )
+        self._spawn(job)
+        return job["_id"]
+
+    async def cancel(self, job_id) -> bool:
+        result = await self.jobs_col.update_one(
+            {"_id": job_id, "status": "running"}, {"$set": {"status": "cancelled"}}
+        )
+        return result.modified_count > 0
+
+    async def resume_pending(self):
+        """Qayta ishga tushgandan keyin tugallanmagan vazifalarni davom ettirish"""
+        while True:
+            job = await self.jobs_col.find_one_and_update(
+                {"status": "running", "lease_until": {"$lt": _now()}, "_id": {"$nin": list(self.active)}},
+                {"$set": {"lease_until": _now() + timedelta(seconds=LEASE_SECONDS), "lease_owner": self.owner}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            print(f"📢 Broadcast {job['_id']} davom ettirilmoqda (checkpoint: {job.get('checkpoint')})")
+            self._spawn(job)
+
+    async def run(self):
+        """Boshqa worker to'xtab qolsa, lease tugashi bilan vazifasini olish"""
+        while True:
+            try:
+                await self.resume_pending()
+            except PyMongoError as e:
+                print(f"Broadcast vazifalarini tekshirishda xato: {e}")
+            await asyncio.sleep(LEASE_SECONDS / 2)
+
+    async def release(self):
+        """To'xtashda: vazifalar lease tugashini kutmasdan darhol davom ettirilishi uchun"""
+        if not self.active:
+            return
+        tasks = list(self.active.values())
+        job_ids = list(self.active)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await self.jobs_col.update_many(
+                {"_id": {"$in": job_ids}, "status": "running", "lease_owner": self.owner},
+                {"$set": {"lease_until": datetime.fromtimestamp(0, timezone.utc)}}
+            )
+        except PyMongoError as e:
+            print(f"Broadcast lease'ini bo'shatishda xato: {e}")
+
+    def _spawn(self, job):
+        task = asyncio.create_task(self._run(job))
+        self.active[job["_id"]] = task
+        task.add_done_callback(lambda _: self.active.pop(job["_id"], None))
+
+    async def _run(self, job):
+        job_id = job["_id"]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_report = time.monotonic()
+
+        async def send_one(user_id):
+            async with semaphore:
+                return await self._send(job, user_id)
+
+        try:
+            while job["status"] == "running":
+                query = {"_id": {"$gt": job["checkpoint"]}} if job["checkpoint"] else {}
+                batch = await self.users_col.find_list(
+                    query, projection={"user_id": 1}, sort=[("_id", 1)], limit=self.batch_size
+                )
+                if not batch:
+                    job["status"] = "done"
+                    await self.jobs_col.update_one(
+                        {"_id": job_id, "status": "running", "lease_owner": self.owner}, {"$set": {"status": "done"}}
+                    )
+                    break
+                results = await asyncio.gather(*(send_one(u["user_id"]) for u in batch))
+                inc = {key: results.count(key) for key in ("sent", "blocked", "failed")}
+                # Checkpoint + lease yangilash; admin to'xtatgan bo'lsa — shu yerda bilinadi
+                job = await self.jobs_col.find_one_and_update(
+                    {"_id": job_id, "lease_owner": self.owner},
+                    {
+                        "$set": {
+                            "checkpoint": batch[-1]["_id"],
+                            "lease_until": _now() + timedelta(seconds=LEASE_SECONDS),
+                        },
+                        "$inc": inc,
+                    },
+                    return_document=ReturnDocument.AFTER
+                )
+                if job is None:
+                    # Lease boshqa workerga o'tgan yoki vazifa o'chirilgan — takror yubormaslik uchun to'xtaymiz
+                    print(f"Broadcast {job_id}: lease yo'qotildi, to'xtatildi")
+                    return
+                if time.monotonic() - last_report >= BROADCAST_PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await self._report(job)
+        except PyMongoError as e:
+            # Lease tugagach shu yoki boshqa worker davom ettiradi
+            print(f"Broadcast {job_id} to'xtadi: {e}")
+            return
+        await self._report(job, final=True)
+
+    async def _send(self, job, user_id) -> str:
+        try:
+            await call_with_retry(
+                self.bot.copy_message, chat_id=user_id,
+                from_chat_id=job["from_chat_id"], message_id=job["message_id"],
+                limiter=self.limiter
+            )
+            return "sent"
+        except (Unauthorized, ChatNotFound):
+            return "blocked"
+        except TelegramAPIError as e:
+            print(f"Broadcast xato ({user_id}): {e}")
+            return "failed"
+
+    async def _report(self, job, final=False):
+        if not job.get("progress_message_id"):
+            return
+        try:
+            await self.bot.edit_message_text(
+                progress_text(job),
+                chat_id=job["admin_chat_id"],
+                message_id=job["progress_message_id"],
+                reply_markup=None if final else stop_keyboard(job["_id"])
+            )
+        except TelegramAPIError as e:
+            print(f"Broadcast holatini yangilashda xato: {e}")
@@ -1,23 +1,261 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import contextvars
+import itertools
 import os
 
+from metrics import Gauge, MongoCommandTimer
+from profiling import PROFILE_HANDLERS, MongoCommandCapture
+
 MONGO_URI = os.getenv("MONGO_URI")
 if not MONGO_URI:
     raise ValueError("MONGO_URI muhit o'zgaruvchisi mavjud emas!")
+# Benchmark va sinov uchun alohida baza tanlash mumkin
+MONGO_DB = os.getenv("MONGO_DB", "kino_bot")
+
+# Bir vaqtda bajariladigan Mongo so'rovlari soni (thread pool hajmi)
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", "32"))
+
+_listeners = [MongoCommandTimer()]
+if PROFILE_HANDLERS:
+    _listeners.append(MongoCommandCapture())
+
+client = MongoClient(MONGO_URI, maxPoolSize=max(MONGO_POOL_SIZE, 100), event_listeners=_listeners)
+db = client[MONGO_DB]
+
+# pymongo sinxron — shu sabab chaqiruvlar alohida thread poolda bajariladi,
+# event loop esa boshqa foydalanuvchilarga xizmat qilishda davom etadi
+_executor = ThreadPoolExecutor(max_workers=MONGO_POOL_SIZE, thread_name_prefix="mongo")
+Gauge("bot_mongo_executor_queue", "Thread pool'da navbat kutayotgan Mongo chaqiruvlari",
+      fn=lambda: _executor._work_queue.qsize())
+
+
+async def run_sync(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Kontekst thread'ga o'tkaziladi (profiling qaysi handler buyrug'i ekanini biladi)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(context.run, func, *args, **kwargs))
+
+
+def _proxy(name):
+    async def method(self, *args, **kwargs):
+        return await run_sync(getattr(self.sync, name), *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+def _next_batch(cursor, size):
+    return list(itertools.islice(cursor, size))
+
+
+class AsyncCollection:
+    """pymongo kolleksiyasi ustidan async o'ram. Asl kolleksiya `.sync` orqali olinadi."""
+
+    def __init__(self, collection):
+        self.sync = collection
+        self.name = collection.name
+
+    find_one = _proxy("find_one")
+    insert_one = _proxy("insert_one")
+    insert_many = _proxy("insert_many")
+    update_one = _proxy("update_one")
+    update_many = _proxy("update_many")
+    replace_one = _proxy("replace_one")
+    delete_one = _proxy("delete_one")
+    delete_many = _proxy("delete_many")
+    count_documents = _proxy("count_documents")
+    estimated_document_count = _proxy("estimated_document_count")
+    find_one_and_update = _proxy("find_one_and_update")
+    bulk_write = _proxy("bulk_write")
+    create_index = _proxy("create_index")
+
+    async def find_list(self, *args, **kwargs):
+        return await run_sync(lambda: list(self.sync.find(*args, **kwargs)))
+
+    async def aggregate_list(self, pipeline, **kwargs):
+        return await run_sync(lambda: list(self.sync.aggregate(pipeline, **kwargs)))
+
+    async def find_batches(self, filter=None, batch_size=500, **kwargs):
+        """Katta natijalarni xotiraga to'liq yuklamasdan, bo'laklab qaytaradi."""
+        cursor = self.sync.find(filter or {}, batch_size=batch_size, **kwargs)
+        try:
+            while True:
+                batch = await run_sync(_next_batch, cursor, batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
 
-client = MongoClient(MONGO_URI)
-db = client["kino_bot"]
 
 # Kolleksiyalarni aniqlash — ✅ SHU YERDA:
-users_col = db["users"]
-pending_videos_col = db["pending_videos"]
-approved_videos_col = db["approved_videos"]
-channels_col = db["channels"]
-admins_col = db["admins"]  # ✅ TO'G'RI JOY — BARCHA KOLLEKSIYALAR BIRGA
+users_col = AsyncCollection(db["users"])
+pending_videos_col = AsyncCollection(db["pending_videos"])
+approved_videos_col = AsyncCollection(db["approved_videos"])
+channels_col = AsyncCollection(db["channels"])
+admins_col = AsyncCollection(db["admins"])  # ✅ TO'G'RI JOY — BARCHA KOLLEKSIYALAR BIRGA
 
 MAIN_ADMIN_ID = 7162630033
 
 # Asosiy adminni qo'shish (bir marta)
-if not admins_col.find_one({"user_id": MAIN_ADMIN_ID}):
-    admins_col.insert_one({"user_id": MAIN_ADMIN_ID})
-settings_col = db["settings"]
+if not admins_col.sync.find_one({"user_id": MAIN_ADMIN_ID}):
+    admins_col.sync.insert_one({"user_id": MAIN_ADMIN_ID})
+settings_col = AsyncCollection(db["settings"])
+counters_col = AsyncCollection(db["counters"])
+broadcasts_col = AsyncCollection(db["broadcasts"])
+fsm_col = AsyncCollection(db["fsm"])
+mirror_col = AsyncCollection(db["mirror_queue"])
+
+# Har bir worker bir martada shuncha kodni band qiladi
+CODE_BLOCK_SIZE = int(os.getenv("CODE_BLOCK_SIZE", "10"))
+
+
+class CodeAllocator:
+    """counters kolleksiyasidagi atomar hisoblagich asosida kino kodlari."""
+
+    def __init__(self, counters_col, name="movie_code", block_size=CODE_BLOCK_SIZE):
+        self.counters_col = counters_col
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0  # band qilingan blokning oxiri (shu ham kiradi)
+        self._lock = asyncio.Lock()
+
+    async def _reserve(self, count):
+        doc = await self.counters_col.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["seq"] - count + 1, doc["seq"]
+
+    def reset(self):
+        """Band qilingan blokni tashlab yuborish — keyingi kod hisoblagichdan olinadi"""
+        self._next = self._end = 0
+
+    async def next_code(self) -> str:
+        async with self._lock:
+            if self._next == 0 or self._next > self._end:
+                self._next, self._end = await self._reserve(self.block_size)
+            number = self._next
+            self._next += 1
+        return str(number).zfill(4)
+
+    async def next_codes(self, count: int):
+        """Ommaviy tasdiqlash uchun ketma-ket kodlar"""
+        async with self._lock:
+            codes = []
+            while self._next and self._next <= self._end and len(codes) < count:
+                codes.append(self._next)
+                self._next += 1
+            if len(codes) < count:
+                start, end = await self._reserve(count - len(codes))
+                codes.extend(range(start, end + 1))
+        return [str(n).zfill(4) for n in codes]
+
+
+# ======================================
+# Indekslar va sxema migratsiyasi
+# ======================================
+
+def _normalize_admin_ids():
+    """admins.user_id ni int turiga keltirish"""
+    for admin in admins_col.sync.find({"user_id": {"$type": "string"}}):
+        try:
+            uid = int(admin["user_id"])
+        except ValueError:
+            continue
+        if admins_col.sync.find_one({"user_id": uid}):
+            admins_col.sync.delete_one({"_id": admin["_id"]})
+        else:
+            admins_col.sync.update_one({"_id": admin["_id"]}, {"$set": {"user_id": uid}})
+
+
+def _duplicates(col, field):
+    return col.sync.aggregate([
+        {"$group": {"_id": f"${field}", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+
+def _dedupe_unique_fields():
+    """Unikal indeksdan oldin takrorlangan user_id va kodlarni tozalash"""
+    for col in (users_col, admins_col):
+        for dup in _duplicates(col, "user_id"):
+            col.sync.delete_many({"_id": {"$in": dup["ids"][1:]}})
+    # Takroriy kodli kinolar o'chirilmaydi — birinchisidan keyingilariga qo'shimcha beriladi
+    for dup in _duplicates(approved_videos_col, "code"):
+        for n, _id in enumerate(dup["ids"][1:], 2):
+            approved_videos_col.sync.update_one({"_id": _id}, {"$set": {"code": f"{dup['_id']}-{n}"}})
+
+
+def _create_indexes():
+    """Qidiruv va ro'yxatlar uchun indekslar"""
+    users_col.sync.create_index([("user_id", ASCENDING)], unique=True)
+    admins_col.sync.create_index([("user_id", ASCENDING)], unique=True)
+    approved_videos_col.sync.create_index([("code", ASCENDING)], unique=True)
+    approved_videos_col.sync.create_index([("views", DESCENDING)])
+    pending_videos_col.sync.create_index([("message_id", ASCENDING), ("chat_id", ASCENDING)])
+    channels_col.sync.create_index([("channel_id", ASCENDING)], unique=True)
+    settings_col.sync.create_index([("key", ASCENDING)], unique=True)
+
+
+def _seed_code_counter():
+    """Kod hisoblagichini mavjud eng katta raqamli koddan boshlash"""
+    top = 0
+    for doc in approved_videos_col.sync.find({"code": {"$regex": r"^\d+$"}}, projection={"code": 1}):
+        top = max(top, int(doc["code"]))
+    counters_col.sync.update_one({"_id": "movie_code"}, {"$max": {"seq": top}}, upsert=True)
+
+
+def _create_broadcast_indexes():
+    """Tugallanmagan broadcast vazifalarini topish uchun indeks"""
+    broadcasts_col.sync.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+
+
+def _create_fsm_ttl_index():
+    """Eskirgan FSM holatlarini avtomatik o'chirish"""
+    fsm_col.sync.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+
+def _create_moderation_indexes():
+    """Moderatsiya navbatini sahifalash va band qilingan yozuvlarni topish uchun indekslar"""
+    pending_videos_col.sync.create_index([("status", ASCENDING), ("_id", ASCENDING)])
+    pending_videos_col.sync.create_index([("claim", ASCENDING)], sparse=True)
+
+
+def _create_import_indexes():
+    """Import: manba xabari bo'yicha takrorni aniqlash va kanal navbati uchun indekslar"""
+    approved_videos_col.sync.create_index([("chat_id", ASCENDING), ("message_id", ASCENDING)], sparse=True)
+    mirror_col.sync.create_index([("lease_until", ASCENDING), ("_id", ASCENDING)])
+
+
+# (versiya, qadam) — yangi qadamlar faqat oxiriga qo'shiladi
+MIGRATIONS = [
+    (1, _normalize_admin_ids),
+    (2, _dedupe_unique_fields),
+    (3, _create_indexes),
+    (4, _seed_code_counter),
+    (5, _create_broadcast_indexes),
+    (6, _create_fsm_ttl_index),
+    (7, _create_moderation_indexes),
+    (8, _create_import_indexes),
+]
+
+
+def run_migrations():
+    setting = settings_col.sync.find_one({"key": "schema_version"})
+    current = setting["value"] if setting else 0
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"🔧 Migratsiya {version}: {step.__doc__}")
+        step()
+        settings_col.sync.update_one(
+            {"key": "schema_version"},
+            {"$set": {"value": version}},
+            upsert=True
+        )
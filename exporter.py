@@ -0,0 +1,135 @@
+"""Katalog va foydalanuvchilarni gzip JSONL/CSV ga eksport qilish (doimiy xotira bilan).
+
+CLI:
+    python exporter.py catalog --format csv
+    python exporter.py users --since 65f0c0ffee0000000000abcd --out users.jsonl.gz
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+from bson import ObjectId, json_util
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "1000"))
+FORMATS = ("jsonl", "csv")
+
+# CSV ustunlari; JSONL da hujjat to'liq yoziladi
+CSV_FIELDS = {
+    "catalog": ("_id", "code", "title", "is_serial", "chat_id", "message_id", "parts", "views"),
+    "users": ("_id", "user_id", "username", "joined_at", "last_seen"),
+}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json_util.dumps(value, ensure_ascii=False)
+    return value
+
+
+class _Writer:
+    """gzip faylga yozish — executor thread'da bajariladi"""
+
+    def __init__(self, path, fmt, fields):
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.fmt = fmt
+        if fmt == "csv":
+            self.csv = csv.writer(self.file)
+            self.fields = fields
+            self.csv.writerow(fields)
+
+    def write(self, docs):
+        if self.fmt == "csv":
+            self.csv.writerows([[_csv_value(doc.get(f)) for f in self.fields] for doc in docs])
+        else:
+            self.file.writelines(
+                json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS, ensure_ascii=False) + "\n"
+                for doc in docs
+            )
+
+    def close(self):
+        self.file.close()
+
+
+class Exporter:
+    """Kolleksiyani _id tartibida bo'laklab o'qib, faylga oqim bilan yozadi."""
+
+    def __init__(self, collections, settings_col, export_dir=EXPORT_DIR, batch_size=EXPORT_BATCH):
+        self.collections = collections  # nom -> AsyncCollection
+        self.settings_col = settings_col
+        self.export_dir = export_dir
+        self.batch_size = batch_size
+
+    async def checkpoint(self, name):
+        """Oxirgi eksportdagi eng katta _id — keyingi inkremental eksport shundan boshlanadi"""
+        setting = await self.settings_col.find_one({"key": f"export_checkpoint_{name}"})
+        return setting["value"] if setting else None
+
+    async def export(self, name, fmt="jsonl", since=None, path=None, incremental=False):
+        """(fayl yo'li, hujjatlar soni, oxirgi _id) qaytaradi.
+        incremental — saqlangan checkpoint'dan boshlab, oxirida uni siljitadi"""
+        if name not in self.collections:
+            raise ValueError(f"Noma'lum kolleksiya: {name}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Noma'lum format: {fmt}")
+        if incremental:
+            since = await self.checkpoint(name)
+        if path is None:
+            os.makedirs(self.export_dir, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+            suffix = f"-since-{since}" if since else ""
+            path = os.path.join(self.export_dir, f"{name}-{stamp}{suffix}.{fmt}.gz")
+
+        loop = asyncio.get_running_loop()
+        writer = await loop.run_in_executor(None, _Writer, path, fmt, CSV_FIELDS[name])
+        count, last_id = 0, since
+        try:
+            query = {"_id": {"$gt": since}} if since else {}
+            async for batch in self.collections[name].find_batches(
+                query, batch_size=self.batch_size, sort=[("_id", 1)]
+            ):
+                # Siqish va yozish event loopni to'xtatmasligi uchun thread'da
+                await loop.run_in_executor(None, writer.write, batch)
+                count += len(batch)
+                last_id = batch[-1]["_id"]
+        finally:
+            await loop.run_in_executor(None, writer.close)
+
+        # To'liq yoki qo'lda berilgan since bilan eksport checkpoint'ga tegmaydi
+        if incremental and last_id is not None and last_id != since:
+            await self.settings_col.update_one(
+                {"key": f"export_checkpoint_{name}"}, {"$set": {"value": last_id}}, upsert=True
+            )
+        return path, count, last_id
+
+
+async def _main(args):
+    from database import approved_videos_col, users_col, settings_col
+    exporter = Exporter({"catalog": approved_videos_col, "users": users_col}, settings_col)
+    since = ObjectId(args.since) if args.since else None
+    path, count, last_id = await exporter.export(
+        args.collection, args.format, since=since, path=args.out, incremental=args.incremental
+    )
+    print(f"💾 {count} ta hujjat: {path}")
+    if last_id:
+        print(json.dumps({"last_id": str(last_id)}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Katalog/foydalanuvchilarni gzip JSONL yoki CSV ga eksport")
+    parser.add_argument("collection", choices=("catalog", "users"))
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--since", help="shu ObjectId dan keyingi hujjatlar")
+    parser.add_argument("--incremental", action="store_true", help="oxirgi eksportdan keyingilar")
+    parser.add_argument("--out", help="fayl yo'li (standart: EXPORT_DIR ichida)")
+    asyncio.run(_main(parser.parse_args()))
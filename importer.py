@@ -0,0 +1,344 @@
+"""Katalogni JSONL manifestdan import qilish.
+
+Har bir qator — bitta kino yoki serial:
+    {"chat_id": -1001234567890, "message_id": 15, "title": "Titanik", "code": "0150"}
+    {"title": "Kasalxona", "code": "S012", "parts": [{"chat_id": -100123, "message_id": 40}, ...]}
+`code` berilmasa, avtomatik ajratiladi.
+
+CLI:
+    python importer.py archive.jsonl [--mirror] [--batch 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, PyMongoError
+from aiogram.utils.exceptions import TelegramAPIError
+
+from ratelimit import RateLimiter, bot_limiter, call_with_retry
+from search import publish_change
+
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "500"))
+# Kanalga joylash tezligi: Telegram kanal/guruhga ~20 xabar/daqiqa ruxsat beradi
+MIRROR_RATE = float(os.getenv("MIRROR_RATE", "0.3"))
+MIRROR_LEASE_SECONDS = 60
+MIRROR_MAX_ATTEMPTS = 3
+MAX_TITLE_LENGTH = 255
+MAX_PARTS = 2000
+CODE_PATTERN = re.compile(r"^[\w-]{1,32}$")
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def _message_ref(value, where: str) -> dict:
+    if not isinstance(value, dict):
+        raise ManifestError(f"{where}: obyekt bo'lishi kerak")
+    chat_id, message_id = value.get("chat_id"), value.get("message_id")
+    if isinstance(chat_id, bool) or not isinstance(chat_id, int):
+        raise ManifestError(f"{where}: chat_id butun son bo'lishi kerak")
+    if isinstance(message_id, bool) or not isinstance(message_id, int) or message_id <= 0:
+        raise ManifestError(f"{where}: message_id musbat butun son bo'lishi kerak")
+    return {"chat_id": chat_id, "message_id": message_id}
+
+
+def parse_entry(line):
+    """Manifest qatori -> approved_videos hujjati (bo'sh qator uchun None)"""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        raise ManifestError(f"JSON xato: {e}")
+    if not isinstance(data, dict):
+        raise ManifestError("qator JSON obyekt bo'lishi kerak")
+
+    title = data.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ManifestError("title bo'sh")
+    title = title.strip()
+    if len(title) > MAX_TITLE_LENGTH:
+        raise ManifestError(f"title {MAX_TITLE_LENGTH} belgidan uzun")
+
+    code = data.get("code")
+    if isinstance(code, int) and not isinstance(code, bool):
+        code = str(code).zfill(4)
+    if code is not None and (not isinstance(code, str) or not CODE_PATTERN.match(code)):
+        raise ManifestError(f"code noto'g'ri: {code!r}")
+
+    views = data.get("views", 0)
+    if isinstance(views, bool) or not isinstance(views, int) or views < 0:
+        raise ManifestError("views manfiy bo'lmagan butun son bo'lishi kerak")
+
+    if "parts" in data:
+        parts = data["parts"]
+        if not isinstance(parts, list) or not parts:
+            raise ManifestError("parts bo'sh bo'lmagan ro'yxat bo'lishi kerak")
+        if len(parts) > MAX_PARTS:
+            raise ManifestError(f"parts {MAX_PARTS} tadan ko'p")
+        return {
+            "code": code, "title": title, "is_serial": True, "views": views,
+            "parts": [_message_ref(part, f"parts[{i}]") for i, part in enumerate(parts)],
+        }
+    return dict(_message_ref(data, "kino"), code=code, title=title, is_serial=False, views=views)
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []  # (qator raqami, sabab) — birinchi 20 tasi
+
+    def error(self, line_number, reason):
+        if len(self.errors) < 20:
+            self.errors.append((line_number, str(reason)))
+
+    def text(self) -> str:
+        lines = [
+            f"✅ Qo'shildi: {self.inserted}",
+            f"⏭ O'tkazib yuborildi (mavjud): {self.skipped}",
+            f"❌ Xato qatorlar: {self.invalid}",
+        ]
+        lines += [f"  {number}-qator: {reason}" for number, reason in self.errors]
+        return "\n".join(lines)
+
+
+class CatalogImporter:
+    """Manifestni oqim sifatida o'qib, partiyalab bulk_write bilan yozadi."""
+
+    def __init__(self, videos_col, counters_col, mirror_col, code_allocator, batch_size=IMPORT_BATCH):
+        self.videos_col = videos_col
+        self.counters_col = counters_col
+        self.mirror_col = mirror_col
+        self.code_allocator = code_allocator
+        self.batch_size = batch_size
+        self.listeners = []  # async fn(videos) — har bir partiya yozilgandan keyin
+
+    async def run(self, lines, base_channel=None, progress=None) -> ImportReport:
+        """lines ikki marta o'qiladi (ro'yxat yoki qayta ochiladigan fayl).
+        progress — async fn(report), har bir partiyadan keyin chaqiriladi"""
+        # Avtomatik kod manifestda keyinroq keladigan qo'lda berilgan kodni
+        # egallab qo'ymasligi uchun hisoblagich oldindan ulardan o'tkaziladi
+        await self._bump_counter(self._explicit_codes(lines))
+        report = ImportReport()
+        seen_codes = set()
+        batch = []
+        for number, line in enumerate(lines, 1):
+            try:
+                entry = parse_entry(line)
+            except ManifestError as e:
+                report.invalid += 1
+                report.error(number, e)
+                continue
+            if entry is None:
+                continue
+            if entry["code"] is not None:
+                if entry["code"] in seen_codes:
+                    report.invalid += 1
+                    report.error(number, f"kod manifestda takrorlangan: {entry['code']}")
+                    continue
+                seen_codes.add(entry["code"])
+            batch.append((number, entry))
+            if len(batch) >= self.batch_size:
+                await self._write(batch, report, base_channel)
+                batch = []
+                if progress:
+                    await progress(report)
+        if batch:
+            await self._write(batch, report, base_channel)
+        return report
+
+    @staticmethod
+    def _explicit_codes(lines):
+        """Oldindan o'qish: faqat raqamli kodlarning eng kattasi kerak"""
+        top = None
+        for line in lines:
+            try:
+                entry = parse_entry(line)
+            except ManifestError:
+                continue
+            code = entry and entry["code"]
+            if code and code.isdigit() and (top is None or int(code) > int(top)):
+                top = code
+        return [top] if top else []
+
+    async def _write(self, batch, report, base_channel):
+        # Qayta ishga tushirilganda bir xil manba xabarini ikki marta qo'shmaslik
+        films = [entry for _, entry in batch if not entry["is_serial"]]
+        existing = set()
+        if films:
+            docs = await self.videos_col.find_list(
+                {"$or": [{"chat_id": e["chat_id"], "message_id": e["message_id"]} for e in films]},
+                projection={"chat_id": 1, "message_id": 1}
+            )
+            existing = {(d["chat_id"], d["message_id"]) for d in docs}
+        todo = []
+        for number, entry in batch:
+            if not entry["is_serial"] and (entry["chat_id"], entry["message_id"]) in existing:
+                report.skipped += 1
+                continue
+            entry["_id"] = ObjectId()
+            todo.append((number, entry, entry["code"] is None))
+
+        auto = [entry for _, entry, is_auto in todo if is_auto]
+        for entry, code in zip(auto, await self.code_allocator.next_codes(len(auto)) if auto else []):
+            entry["code"] = code
+
+        written = []
+        pending = todo
+        while pending:
+            try:
+                await self.videos_col.bulk_write([InsertOne(entry) for _, entry, _ in pending], ordered=False)
+                written += pending
+                break
+            except BulkWriteError as e:
+                failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+                written += [item for i, item in enumerate(pending) if i not in failed]
+                retry = []
+                for index, err in failed.items():
+                    number, entry, is_auto = pending[index]
+                    if err.get("code") != 11000:
+                        report.invalid += 1
+                        report.error(number, err.get("errmsg", "yozishda xato"))
+                    elif is_auto:
+                        retry.append(pending[index])
+                    else:
+                        report.skipped += 1
+                        report.error(number, f"kod band: {entry['code']}")
+                # Avtomatik kod qo'lda kiritilgan kod bilan to'qnashgan — yangisini olamiz
+                for (_, entry, _), code in zip(retry, await self.code_allocator.next_codes(len(retry)) if retry else []):
+                    entry["code"] = code
+                pending = retry
+
+        videos = [entry for _, entry, _ in written]
+        report.inserted += len(videos)
+        if videos:
+            # Ishlayotgan bot workerlari (CLI importda ham) indeksni yangilaydi
+            await publish_change(self.counters_col)
+        if videos and base_channel:
+            await self.mirror_col.insert_many([mirror_job(video, base_channel) for video in videos])
+        for listener in self.listeners:
+            await listener(videos)
+
+    async def _bump_counter(self, codes):
+        """Qo'lda berilgan raqamli kodlardan keyin avtomatik kodlar to'qnashmasligi uchun"""
+        numeric = [int(code) for code in codes if code.isdigit()]
+        if numeric:
+            await self.counters_col.update_one(
+                {"_id": self.code_allocator.name}, {"$max": {"seq": max(numeric)}}, upsert=True
+            )
+            # Oldin band qilingan blokda shu kodlar bo'lishi mumkin
+            self.code_allocator.reset()
+
+
+def mirror_job(video, base_channel) -> dict:
+    if video["is_serial"]:
+        source = video["parts"][-1]
+        caption = f"✅ Serial qo'shildi!\n{video['title']}\nKod: {video['code']}"
+    else:
+        source = video
+        caption = f"✅ {video['title']}\n\nKod: {video['code']}"
+    return {
+        "chat_id": base_channel,
+        "from_chat_id": source["chat_id"],
+        "message_id": source["message_id"],
+        "caption": caption,
+        "attempts": 0,
+        "lease_until": datetime.fromtimestamp(0, timezone.utc),
+    }
+
+
+class MirrorQueue:
+    """Baza kanalga joylash navbati (Mongo'da) — bot qayta ishga tushsa ham davom etadi."""
+
+    def __init__(self, bot, mirror_col, rate=MIRROR_RATE):
+        self.bot = bot
+        self.mirror_col = mirror_col
+        self.limiter = RateLimiter(rate, parent=bot_limiter)
+
+    async def _next_job(self):
+        now = datetime.now(timezone.utc)
+        return await self.mirror_col.find_one_and_update(
+            {"lease_until": {"$lt": now}},
+            {"$set": {"lease_until": now + timedelta(seconds=MIRROR_LEASE_SECONDS)}, "$inc": {"attempts": 1}},
+            sort=[("_id", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def run(self):
+        while True:
+            try:
+                job = await self._next_job()
+            except PyMongoError as e:
+                print(f"Kanal navbatini o'qishda xato: {e}")
+                job = None
+            if not job:
+                await asyncio.sleep(5)
+                continue
+            try:
+                await call_with_retry(
+                    self.bot.copy_message, chat_id=job["chat_id"], from_chat_id=job["from_chat_id"],
+                    message_id=job["message_id"], caption=job["caption"], limiter=self.limiter, retries=10
+                )
+            except TelegramAPIError as e:
+                print(f"Baza kanalga joylashda xato ({job['from_chat_id']}/{job['message_id']}): {e}")
+                if job["attempts"] < MIRROR_MAX_ATTEMPTS:
+                    continue  # lease tugagach qayta uriniladi
+            try:
+                await self.mirror_col.delete_one({"_id": job["_id"]})
+            except PyMongoError as e:
+                # Lease tugagach qayta yuborilishi mumkin — navbat to'xtamasin
+                print(f"Kanal navbatidan o'chirishda xato: {e}")
+
+
+class _ManifestFile:
+    """Har iteratsiyada faylni qaytadan ochadi (run() uni ikki marta o'qiydi)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            yield from f
+
+
+async def _main(args):
+    from database import (
+        approved_videos_col, counters_col, mirror_col, settings_col, CodeAllocator, run_migrations
+    )
+    run_migrations()
+    base_channel = None
+    if args.mirror:
+        setting = await settings_col.find_one({"key": "base_channel"})
+        base_channel = setting["value"] if setting else None
+        if not base_channel:
+            raise SystemExit("Baza kanal sozlanmagan — --mirror ishlamaydi")
+    importer = CatalogImporter(
+        approved_videos_col, counters_col, mirror_col, CodeAllocator(counters_col), batch_size=args.batch
+    )
+
+    async def progress(report):
+        print(f"... qo'shildi: {report.inserted}, o'tkazildi: {report.skipped}, xato: {report.invalid}")
+
+    report = await importer.run(_ManifestFile(args.manifest), base_channel=base_channel, progress=progress)
+    print(report.text())
+    if base_channel and report.inserted:
+        print("📡 Baza kanalga joylash navbatga qo'yildi — ishlayotgan bot uni asta-sekin yuboradi.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Katalogni JSONL manifestdan import qilish")
+    parser.add_argument("manifest", help="JSONL fayl")
+    parser.add_argument("--mirror", action="store_true", help="baza kanalga ham joylash")
+    parser.add_argument("--batch", type=int, default=IMPORT_BATCH, help="bitta bulk_write hajmi")
+    asyncio.run(_main(parser.parse_args()))
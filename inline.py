@@ -0,0 +1,79 @@
+import os
+from collections import OrderedDict
+
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+)
+
+from search import normalize
+
+INLINE_CACHE_SIZE = int(os.getenv("INLINE_CACHE_SIZE", "1000"))
+# Telegram serverlari javobni shuncha soniya o'zida saqlaydi
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_MAX_RESULTS = 50  # Bot API cheklovi
+
+
+def deep_link(bot_username: str, _id) -> str:
+    return f"https://t.me/{bot_username}?start=v{_id}"
+
+
+class InlineSearch:
+    """@bot so'rovlari: qidiruv indeksidan javob, tez-tez so'raladiganlari xotirada."""
+
+    def __init__(self, search_index, size=INLINE_CACHE_SIZE, cache_time=INLINE_CACHE_TIME):
+        self.search_index = search_index
+        self.size = size
+        self.cache_time = cache_time
+        self._cache = OrderedDict()  # kod yoki normallashgan so'rov -> (indeks versiyasi, natijalar)
+
+    def _ranked(self, key):
+        video_id = self.search_index.by_code(key)
+        if video_id:
+            return [(video_id, self.search_index.get(video_id))]
+        if not key:
+            # Bo'sh so'rov — eng ko'p ko'rilganlar
+            return self.search_index.top(INLINE_MAX_RESULTS)
+        return self.search_index.search(key, limit=INLINE_MAX_RESULTS)
+
+    def _build(self, ranked, bot_username):
+        results = []
+        for _id, entry in ranked:
+            typ = "📺 Serial" if entry["is_serial"] else "🎥 Kino"
+            link = deep_link(bot_username, _id)
+            results.append(InlineQueryResultArticle(
+                id=str(_id),
+                title=entry["title"] or f"Kod: {entry['code']}",
+                description=f"{typ} • Kod: {entry['code']} • 👁 {entry['views']}",
+                input_message_content=InputTextMessageContent(
+                    f"🎬 {entry['title']}\nKod: {entry['code']}\n\n▶️ Ko'rish: {link}"
+                ),
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                    [InlineKeyboardButton(text="▶️ Ko'rish", url=link)]
+                ]),
+            ))
+        return results
+
+    def results(self, query: str, bot_username: str):
+        # Kod harf katta-kichikligi bilan solishtiriladi, nom esa normallashtirib
+        key = query.strip()
+        if not self.search_index.by_code(key):
+            key = normalize(query)
+        version = self.search_index.version
+        cached = self._cache.get(key)
+        if cached and cached[0] == version:
+            self._cache.move_to_end(key)
+            return cached[1]
+        results = self._build(self._ranked(key), bot_username)
+        self._cache[key] = (version, results)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+        return results
+
+    async def answer(self, inline_query):
+        bot_username = (await inline_query.bot.me).username
+        await inline_query.answer(
+            self.results(inline_query.query, bot_username),
+            cache_time=self.cache_time,
+            is_personal=False,
+        )
@@ -0,0 +1,48 @@
+import inspect
+
+from aiogram import types
+from aiogram.dispatcher import FSMContext
+
+
+class MenuRouter:
+    """Menyu tugmalari: matn -> handler lug'ati. Dispatcher'da bitta handler bo'lib turadi."""
+
+    def __init__(self):
+        self.routes = {}  # matn -> (handler, rol, rad javobi, state kerakmi)
+        self.guards = {}  # rol -> async fn(message) -> bool
+
+    def guard(self, role: str):
+        """Rol tekshiruvi: False qaytsa handler chaqirilmaydi"""
+        def decorator(func):
+            self.guards[role] = func
+            return func
+        return decorator
+
+    def __call__(self, text: str, role: str = None, denied: str = None):
+        def decorator(handler):
+            if text in self.routes:
+                raise ValueError(f"Menyu tugmasi ikki marta ro'yxatdan o'tdi: {text}")
+            wants_state = len(inspect.signature(handler).parameters) > 1
+            self.routes[text] = (handler, role, denied, wants_state)
+            return handler
+        return decorator
+
+    def resolve(self, handler, message):
+        """Metrikalar uchun: dispatch o'rniga tugmaning o'z handleri"""
+        if handler == self.dispatch and getattr(message, "text", None) in self.routes:
+            return self.routes[message.text][0]
+        return handler
+
+    def matches(self, message: types.Message) -> bool:
+        return message.text in self.routes
+
+    async def dispatch(self, message: types.Message, state: FSMContext):
+        handler, role, denied, wants_state = self.routes[message.text]
+        if role and not await self.guards[role](message):
+            if denied:
+                await message.answer(denied)
+            return
+        if wants_state:
+            await handler(message, state)
+        else:
+            await handler(message)
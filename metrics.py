@@ -0,0 +1,223 @@
+import asyncio
+import bisect
+import threading
+import time
+
+from aiogram import Bot
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from pymongo import monitoring
+
+# Prometheus matn formati (text/plain; version=0.0.4) — tashqi kutubxonasiz
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_metrics = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        # Mongo hodisalari executor thread'laridan keladi
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(_Metric):
+    """Qiymat o'qish paytida hisoblanadi: fn() -> son yoki {label qiymatlari: son}"""
+    kind = "gauge"
+
+    def __init__(self, name, doc, fn=None, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def _samples(self):
+        value = self.fn() if self.fn else self.value
+        if isinstance(value, dict):
+            for key, v in value.items():
+                yield f"{self.name}{_labels(self.labelnames, key)} {v}"
+        else:
+            yield f"{self.name} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # key -> [bucket hisoblari..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}"
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+handler_seconds = Histogram(
+    "bot_handler_seconds", "Handler bajarilish vaqti", ("event", "handler")
+)
+mongo_seconds = Histogram(
+    "bot_mongo_command_seconds", "Mongo buyrug'i davomiyligi (command monitoring)", ("command",)
+)
+mongo_errors = Counter(
+    "bot_mongo_command_errors_total", "Xato bilan tugagan Mongo buyruqlari", ("command",)
+)
+api_seconds = Histogram(
+    "bot_api_request_seconds", "Bot API so'rovi davomiyligi", ("method",)
+)
+api_errors = Counter(
+    "bot_api_errors_total", "Bot API xatolari", ("method", "error")
+)
+search_cache_requests = Counter(
+    "bot_search_cache_requests_total", "Qidiruv natijalari keshiga murojaatlar", ("result",)
+)
+loop_lag_seconds = Histogram(
+    "bot_event_loop_lag_seconds", "Event loop kechikishi",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """MongoClient(event_listeners=[...]) ga beriladi"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_seconds.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        mongo_seconds.observe(event.duration_micros / 1e6, command=event.command_name)
+        mongo_errors.inc(command=event.command_name)
+
+
+class MeteredBot(Bot):
+    """Har bir Bot API chaqiruvining vaqti va xatolari method bo'yicha"""
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().request(method, data, files, **kwargs)
+        except Exception as e:
+            api_errors.inc(method=method, error=type(e).__name__)
+            raise
+        finally:
+            api_seconds.observe(time.perf_counter() - start, method=method)
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Filtrlar o'tgandan keyin handler ishlagan vaqtni o'lchaydi"""
+
+    def __init__(self, resolve=None):
+        super().__init__()
+        # resolve(handler, obj) -> haqiqiy handler (masalan, menyu router ichidagisi)
+        self.resolve = resolve
+
+    def _start(self, obj, data):
+        handler = current_handler.get(None)
+        if self.resolve and handler is not None:
+            handler = self.resolve(handler, obj)
+        data["_timing"] = (getattr(handler, "__name__", "unknown"), time.perf_counter())
+
+    def _finish(self, event, data):
+        timing = data.get("_timing")
+        if timing:
+            handler_seconds.observe(time.perf_counter() - timing[1], event=event, handler=timing[0])
+
+    async def on_process_message(self, message, data):
+        self._start(message, data)
+
+    async def on_post_process_message(self, message, results, data):
+        self._finish("message", data)
+
+    async def on_process_callback_query(self, callback, data):
+        self._start(callback, data)
+
+    async def on_post_process_callback_query(self, callback, results, data):
+        self._finish("callback_query", data)
+
+    async def on_process_inline_query(self, query, data):
+        self._start(query, data)
+
+    async def on_post_process_inline_query(self, query, results, data):
+        self._finish("inline_query", data)
+
+
+async def watch_loop_lag(interval: float = 0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag_seconds.observe(max(loop.time() - start - interval, 0))
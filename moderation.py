@@ -0,0 +1,104 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+MODERATION_PAGE_SIZE = int(os.getenv("MODERATION_PAGE_SIZE", "8"))
+# Ishlov berish paytida to'xtab qolgan yozuvlar shu vaqtdan keyin navbatga qaytadi
+CLAIM_TIMEOUT = 600
+
+
+class ModerationQueue:
+    """Kutilayotgan videolar: sahifalash va ommaviy tasdiqlash/rad etish."""
+
+    def __init__(self, pending_col, videos_col, code_allocator, page_size=MODERATION_PAGE_SIZE):
+        self.pending_col = pending_col
+        self.videos_col = videos_col
+        self.code_allocator = code_allocator
+        self.page_size = page_size
+
+    async def page(self, page: int):
+        total = await self.pending_col.count_documents({"status": "pending"})
+        docs = await self.pending_col.find_list(
+            {"status": "pending"}, sort=[("_id", 1)],
+            skip=page * self.page_size, limit=self.page_size
+        )
+        return docs, total
+
+    async def _claim(self, ids):
+        """Bir xil videoni ikki admin bir vaqtda tasdiqlab yubormasligi uchun"""
+        token = ObjectId()
+        now = datetime.now(timezone.utc)
+        await self.pending_col.update_many(
+            {
+                "_id": {"$in": list(ids)},
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "processing", "claimed_at": {"$lt": now - timedelta(seconds=CLAIM_TIMEOUT)}},
+                ],
+            },
+            {"$set": {"status": "processing", "claim": token, "claimed_at": now}}
+        )
+        return token, await self.pending_col.find_list({"claim": token}, sort=[("_id", 1)])
+
+    async def approve(self, ids):
+        """[(pending hujjat, approved video), ...] qaytaradi"""
+        token, docs = await self._claim(ids)
+        if not docs:
+            return []
+        codes = await self.code_allocator.next_codes(len(docs))
+        approved = [
+            (doc, {
+                # Pending _id bilan bir xil: qayta band qilinganda ikkinchi marta qo'shilmaydi
+                "_id": doc["_id"],
+                "code": code,
+                "title": doc.get("caption") or f"Kino #{code}",
+                "chat_id": doc["chat_id"],
+                "message_id": doc["message_id"],
+                "is_serial": False,
+                "views": 0,
+            })
+            for doc, code in zip(docs, codes)
+        ]
+        todo = approved
+        while todo:
+            try:
+                await self.videos_col.bulk_write([InsertOne(video) for _, video in todo], ordered=False)
+                break
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                failed = {err["index"] for err in errors}
+                if any(err.get("code") != 11000 for err in errors):
+                    # Yozilganlar navbatdan olib tashlanadi, qolganlari claim tugagach qaytadi
+                    inserted = [video["_id"] for i, (_, video) in enumerate(todo) if i not in failed]
+                    if inserted:
+                        await self.pending_col.delete_many({"_id": {"$in": inserted}})
+                    raise
+                duplicates = [todo[i] for i in sorted(failed)]
+                # Avvalgi urinishda yozilib, xato bilan to'xtaganlar — mavjud hujjat olinadi
+                existing = {
+                    video["_id"]: video for video in await self.videos_col.find_list(
+                        {"_id": {"$in": [video["_id"] for _, video in duplicates]}}
+                    )
+                }
+                todo = []
+                for doc, video in duplicates:
+                    stored = existing.get(video["_id"])
+                    if stored:
+                        video.update(stored)
+                    else:
+                        todo.append((doc, video))
+                # Qo'lda kiritilgan serial kodi bilan to'qnashganlar — yangi kod bilan qayta
+                for (doc, video), code in zip(todo, await self.code_allocator.next_codes(len(todo))):
+                    video["code"] = code
+                    video["title"] = doc.get("caption") or f"Kino #{code}"
+        await self.pending_col.delete_many({"claim": token})
+        return approved
+
+    async def reject(self, ids):
+        token, docs = await self._claim(ids)
+        if docs:
+            await self.pending_col.delete_many({"claim": token})
+        return docs
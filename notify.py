@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+from aiogram.utils.exceptions import TelegramAPIError
+
+from ratelimit import RateLimiter, bot_limiter, call_with_retry
+
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "10"))
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "20"))
+
+
+class Notifier:
+    """Xabarlar fon vazifasida, cheklangan parallellik va tezlik bilan yuboriladi."""
+
+    def __init__(self, bot, concurrency=NOTIFY_CONCURRENCY, rate=NOTIFY_RATE):
+        self.bot = bot
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = RateLimiter(rate, parent=bot_limiter)
+        self._tasks = set()
+
+    def _spawn(self, coros):
+        task = asyncio.create_task(self._gather(coros))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @staticmethod
+    async def _gather(coros):
+        await asyncio.gather(*coros)
+
+    def run_all(self, calls, retries=3):
+        """calls — [(Bot API funksiyasi, kwargs), ...]"""
+        return self._spawn([self._call(func, kwargs, retries) for func, kwargs in calls])
+
+    def send_texts(self, messages):
+        """messages — [(chat_id, matn), ...]"""
+        return self.run_all([(self.bot.send_message, {"chat_id": chat_id, "text": text}) for chat_id, text in messages])
+
+    async def _call(self, func, kwargs, retries):
+        async with self.semaphore:
+            try:
+                await call_with_retry(func, limiter=self.limiter, retries=retries, **kwargs)
+            except TelegramAPIError as e:
+                print(f"{kwargs.get('chat_id')} ga xabar yuborishda xato: {e}")
+
+    async def drain(self):
+        """To'xtashdan oldin navbatdagi xabarlarni yuborib bo'lish"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+class AdminNotifier(Notifier):
+    """Adminlarga xabar: har bir adminga bir marta."""
+
+    def __init__(self, bot, admin_registry, **kwargs):
+        super().__init__(bot, **kwargs)
+        self.admin_registry = admin_registry
+
+    def notify(self, text: str, reply_markup=None, forward=None):
+        """forward — (chat_id, message_id): matndan keyin shu xabar ham uzatiladi"""
+        # Ro'yxat bir marta olinadi, takroriy ID'lar olib tashlanadi
+        admin_ids = list(dict.fromkeys(self.admin_registry.all()))
+        return self._spawn([self._send(admin_id, text, reply_markup, forward) for admin_id in admin_ids])
+
+    async def _send(self, admin_id, text, reply_markup, forward):
+        async with self.semaphore:
+            try:
+                await call_with_retry(
+                    self.bot.send_message, admin_id, text,
+                    reply_markup=reply_markup, limiter=self.limiter
+                )
+                if forward:
+                    await call_with_retry(
+                        self.bot.forward_message, admin_id, *forward, limiter=self.limiter
+                    )
+            except TelegramAPIError as e:
+                print(f"Admin {admin_id} ga xabar yuborishda xato: {e}")
@@ -0,0 +1,123 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from pymongo import monitoring
+
+# PROFILE_HANDLERS=1 bo'lmasa middleware ham, Mongo listener ham ulanmaydi
+PROFILE_HANDLERS = os.getenv("PROFILE_HANDLERS", "0") == "1"
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+# Handlerlarning qancha qismi cProfile ostida ishlaydi (0..1)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "15"))
+
+# Joriy handler davomida bajarilgan Mongo buyruqlari (run_sync konteksti bilan thread'ga o'tadi)
+_commands = contextvars.ContextVar("profiled_commands", default=None)
+_profiler_busy = False
+
+_QUERY_FIELDS = ("filter", "query", "q", "updates", "deletes", "pipeline", "documents")
+
+
+def _describe(command: dict) -> str:
+    for field in _QUERY_FIELDS:
+        if field in command:
+            text = repr(command[field])
+            return f"{field}={text[:300]}{'…' if len(text) > 300 else ''}"
+    return ""
+
+
+class MongoCommandCapture(monitoring.CommandListener):
+    """Profil qilinayotgan handler ichidagi buyruqlarni filtri va vaqti bilan yozib oladi"""
+
+    def started(self, event):
+        commands = _commands.get()
+        if commands is not None:
+            collection = event.command.get(event.command_name)
+            commands[event.request_id] = [event.command_name, collection, _describe(event.command), None]
+
+    def succeeded(self, event):
+        self._finish(event, "")
+
+    def failed(self, event):
+        self._finish(event, f" XATO: {event.failure}")
+
+    def _finish(self, event, suffix):
+        commands = _commands.get()
+        if commands is not None and event.request_id in commands:
+            commands[event.request_id][3] = f"{event.duration_micros / 1000:.1f} ms{suffix}"
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Sekin handlerlarni Mongo buyruqlari va (tanlab olinganda) cProfile natijasi bilan chiqaradi"""
+
+    def __init__(self, slow_ms=PROFILE_SLOW_MS, sample_rate=PROFILE_SAMPLE_RATE, resolve=None):
+        super().__init__()
+        self.slow = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.resolve = resolve
+
+    def _start(self, obj, data):
+        global _profiler_busy
+        handler = current_handler.get(None)
+        if self.resolve and handler is not None:
+            handler = self.resolve(handler, obj)
+        profiler = None
+        # cProfile butun thread'ni kuzatadi — bir vaqtda faqat bittasi
+        if not _profiler_busy and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                _profiler_busy = True
+            except ValueError:  # boshqa profiler allaqachon ishlayapti
+                profiler = None
+        data["_profile"] = (
+            getattr(handler, "__name__", "unknown"), time.perf_counter(), _commands.set({}), profiler
+        )
+
+    def _finish(self, data):
+        global _profiler_busy
+        record = data.get("_profile")
+        if not record:
+            return
+        name, start, token, profiler = record
+        elapsed = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+            _profiler_busy = False
+        commands = _commands.get() or {}
+        _commands.reset(token)
+        if elapsed < self.slow:
+            return
+        lines = [f"🐢 Sekin handler: {name} — {elapsed * 1000:.0f} ms, Mongo buyruqlari: {len(commands)}"]
+        for command_name, collection, query, duration in commands.values():
+            lines.append(f"   {command_name} {collection} {duration or '?'} {query}")
+        if profiler:
+            out = io.StringIO()
+            # Parallel ishlagan boshqa handlerlar ham shu profilga tushishi mumkin
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            lines.append(out.getvalue().strip())
+        print("\n".join(lines))
+
+    async def on_process_message(self, message, data):
+        self._start(message, data)
+
+    async def on_post_process_message(self, message, results, data):
+        self._finish(data)
+
+    async def on_process_callback_query(self, callback, data):
+        self._start(callback, data)
+
+    async def on_post_process_callback_query(self, callback, results, data):
+        self._finish(data)
+
+    async def on_process_inline_query(self, query, data):
+        self._start(query, data)
+
+    async def on_post_process_inline_query(self, query, results, data):
+        self._finish(data)
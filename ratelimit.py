@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+from aiogram.utils.exceptions import NetworkError, RetryAfter
+
+
+# Telegram bitta bot uchun ~30 xabar/s ruxsat beradi. Ommaviy yuboruvchilar (broadcast,
+# xabarnomalar, qismlar, kanal navbati) shu umumiy budjetdan oladi; qolgani —
+# handlerlarning interaktiv javoblari uchun zaxira
+BOT_RATE = float(os.getenv("BOT_RATE", "25"))
+
+
+class RateLimiter:
+    """Bir tekis tezlik: sekundiga `rate` ta chaqiruv. RetryAfter kelsa hammasi to'xtab turadi."""
+
+    def __init__(self, rate: float, parent=None):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        # parent — umumiy budjet: bu limiter undan ajratilgan ulush
+        self.parent = parent
+
+    def set_rate(self, rate: float):
+        self.interval = 1.0 / rate
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        if self.parent:
+            await self.parent.acquire()
+
+    def pause(self, seconds: float):
+        now = asyncio.get_running_loop().time()
+        self._next = max(self._next, now + seconds)
+
+
+bot_limiter = RateLimiter(BOT_RATE)
+
+
+async def call_with_retry(func, *args, limiter=None, retries=3, **kwargs):
+    """Bot API chaqiruvi: flood (RetryAfter) va tarmoq xatolarida kutib qayta urinadi."""
+    for attempt in range(retries + 1):
+        if limiter:
+            await limiter.acquire()
+        try:
+            return await func(*args, **kwargs)
+        except RetryAfter as e:
+            if limiter:
+                limiter.pause(e.timeout)
+            if attempt == retries:
+                raise
+            await asyncio.sleep(e.timeout)
+        except NetworkError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(2 ** attempt)
@@ -0,0 +1,274 @@
+import asyncio
+import bisect
+import hashlib
+import heapq
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+from pymongo.errors import PyMongoError
+
+import metrics
+from database import run_sync
+
+# To'liq qayta yuklash (ko'rishlar soni bo'yicha reyting yangilanadi), soniya
+SEARCH_REFRESH_INTERVAL = int(os.getenv("SEARCH_REFRESH_INTERVAL", "300"))
+# Change stream bo'lmasa, boshqa jarayonlardagi katalog o'zgarishlari shu oraliqda tekshiriladi
+SEARCH_POLL_INTERVAL = float(os.getenv("SEARCH_POLL_INTERVAL", "5"))
+# counters kolleksiyasida: katalog har o'zgarganda oshadigan hisoblagich
+CATALOG_SEQ = "catalog_seq"
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+# Indeks qayta yuklanmasa ham hujjat shu vaqtdan ortiq keshda qolmaydi
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "600"))
+
+_APOSTROPHES = re.compile(r"[‘’ʻʼ`´']")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Kichik harf, diakritikasiz, tinish belgilarisiz ko'rinish"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _APOSTROPHES.sub("", text.lower())
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+async def publish_change(counters_col):
+    """Polling rejimidagi boshqa jarayonlarga: katalog o'zgardi"""
+    await counters_col.update_one({"_id": CATALOG_SEQ}, {"$inc": {"seq": 1}}, upsert=True)
+
+
+class SearchIndex:
+    """Nomlar bo'yicha xotiradagi teskari indeks: so'z prefikslari + reyting."""
+
+    def __init__(self, videos_col, counters_col=None, refresh_interval=SEARCH_REFRESH_INTERVAL,
+                 poll_interval=SEARCH_POLL_INTERVAL):
+        self.videos_col = videos_col
+        self.counters_col = counters_col
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self._seq = None  # oxirgi yuklashdagi CATALOG_SEQ
+        self._docs = {}       # _id -> {"code", "title", "norm", "is_serial", "views"}
+        self._by_code = {}    # code -> _id
+        self._postings = {}   # so'z -> {_id}
+        self._vocab = []      # tartiblangan so'zlar (prefiks qidiruv uchun)
+        self._queries = OrderedDict()  # sahifalash uchun: token -> normallashgan so'rov
+        self.version = 0  # har o'zgarishda oshadi — tashqi keshlar shu bilan eskiradi
+
+    async def _catalog_seq(self):
+        doc = await self.counters_col.find_one({"_id": CATALOG_SEQ})
+        return doc["seq"] if doc else 0
+
+    async def load(self):
+        # Hisoblagich hujjatlardan oldin o'qiladi: yuklash paytidagi o'zgarish keyingi tekshiruvda ko'rinadi
+        if self.counters_col is not None:
+            self._seq = await self._catalog_seq()
+        docs = await self.videos_col.find_list(
+            {}, projection={"code": 1, "title": 1, "is_serial": 1, "views": 1}
+        )
+        self._docs, self._by_code, self._postings = {}, {}, {}
+        for doc in docs:
+            self._add(doc)
+        self._vocab = sorted(self._postings)
+        self.version += 1
+
+    def _add(self, doc):
+        entry = {
+            "code": doc.get("code"),
+            "title": doc.get("title") or "",
+            "norm": normalize(doc.get("title")),
+            "is_serial": bool(doc.get("is_serial")),
+            "views": doc.get("views", 0),
+        }
+        self._docs[doc["_id"]] = entry
+        if entry["code"] is not None:
+            self._by_code[str(entry["code"])] = doc["_id"]
+        for token in set(entry["norm"].split()):
+            self._postings.setdefault(token, set()).add(doc["_id"])
+        return entry
+
+    def add(self, doc):
+        self.remove(doc["_id"])
+        self.version += 1
+        entry = self._add(doc)
+        for token in set(entry["norm"].split()):
+            i = bisect.bisect_left(self._vocab, token)
+            if i == len(self._vocab) or self._vocab[i] != token:
+                self._vocab.insert(i, token)
+
+    def remove(self, _id):
+        entry = self._docs.pop(_id, None)
+        if not entry:
+            return
+        self.version += 1
+        if self._by_code.get(str(entry["code"])) == _id:
+            del self._by_code[str(entry["code"])]
+        for token in set(entry["norm"].split()):
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(_id)
+            if not ids:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+
+    def get(self, _id):
+        return self._docs.get(_id)
+
+    def by_code(self, code: str):
+        return self._by_code.get(code.strip())
+
+    def top(self, limit: int):
+        """Eng ko'p ko'rilganlar (ko'rishlar soni oxirgi yuklashdagi)"""
+        return heapq.nlargest(limit, self._docs.items(), key=lambda item: item[1]["views"])
+
+    def _prefix_ids(self, prefix: str):
+        ids = set()
+        i = bisect.bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            ids |= self._postings[self._vocab[i]]
+            i += 1
+        return ids
+
+    def _score(self, entry, norm, tokens):
+        title_tokens = entry["norm"].split()
+        score = 0
+        if entry["norm"] == norm:
+            score += 100
+        elif entry["norm"].startswith(norm):
+            score += 50
+        for t in tokens:
+            if t in title_tokens:
+                score += 10
+            elif any(tt.startswith(t) for tt in title_tokens):
+                score += 5
+        return score
+
+    def search(self, query: str, limit: int = SEARCH_MAX_RESULTS):
+        """[(_id, entry), ...] — eng mosi birinchi"""
+        norm = normalize(query)
+        tokens = norm.split()
+        if not tokens:
+            return []
+        per_token = [self._prefix_ids(t) for t in tokens]
+        candidates = set.intersection(*per_token)
+        if not candidates:
+            candidates = set.union(*per_token)
+        if not candidates:
+            # Oxirgi chora: so'z o'rtasidagi moslik (avvalgi $regex xatti-harakati)
+            candidates = {_id for _id, e in self._docs.items() if norm in e["norm"]}
+        ranked = sorted(
+            candidates,
+            key=lambda _id: (
+                -self._score(self._docs[_id], norm, tokens),
+                -self._docs[_id]["views"],
+                len(self._docs[_id]["norm"]),
+                self._docs[_id]["norm"],
+            ),
+        )
+        return [(_id, self._docs[_id]) for _id in ranked[:limit]]
+
+    def remember_query(self, query: str) -> str:
+        norm = normalize(query)
+        token = hashlib.sha1(norm.encode()).hexdigest()[:10]
+        self._queries[token] = norm
+        self._queries.move_to_end(token)
+        while len(self._queries) > 10_000:
+            self._queries.popitem(last=False)
+        return token
+
+    def recall_query(self, token: str):
+        return self._queries.get(token)
+
+    async def publish(self):
+        if self.counters_col is None:
+            return
+        try:
+            await publish_change(self.counters_col)
+        except PyMongoError as e:
+            print(f"Katalog o'zgarishini e'lon qilishda xato: {e}")
+
+    async def _watch(self):
+        # Ko'rishlar ($inc views) kuzatilmaydi — ular to'liq yuklashda yangilanadi
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace", "delete"]}}}]
+        stream = await run_sync(self.videos_col.sync.watch, pipeline)
+        try:
+            while True:
+                change = await run_sync(stream.try_next)
+                if change is None:
+                    continue
+                if change["operationType"] == "delete":
+                    self.remove(change["documentKey"]["_id"])
+                else:
+                    self.add(change["fullDocument"])
+        finally:
+            stream.close()
+
+    async def _follow(self):
+        """Boshqa workerlar va import CLI qo'shgan/o'chirgan kinolarni darhol olish"""
+        try:
+            await self._watch()
+        except PyMongoError as e:
+            print(f"Katalog change stream ishlamadi, polling rejimi: {e}")
+        if self.counters_col is None:
+            return
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if await self._catalog_seq() != self._seq:
+                    await self.load()
+            except PyMongoError as e:
+                print(f"Katalog o'zgarishlarini tekshirishda xato: {e}")
+
+    async def _refresh(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                print(f"Qidiruv indeksini yangilashda xato: {e}")
+
+    async def run(self):
+        await asyncio.gather(self._follow(), self._refresh())
+
+
+class ResultCache:
+    """Hal qilingan qidiruvlar: kod yoki normallashgan nom -> natija (LRU + TTL).
+
+    Indeks versiyasi o'zgarsa (kino qo'shildi/o'chirildi, qayta yuklandi) yozuv eskirgan
+    hisoblanadi; TTL esa Mongo hujjatlarining o'zgarishini cheklaydi.
+    """
+
+    def __init__(self, search_index, size=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL):
+        self.search_index = search_index
+        self.size = size
+        self.ttl = ttl
+        self._items = OrderedDict()  # kalit -> (indeks versiyasi, muddati, natija)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is not None and (item[0] != self.search_index.version or item[1] < time.monotonic()):
+            del self._items[key]
+            item = None
+        if item is None:
+            self.misses += 1
+            metrics.search_cache_requests.inc(result="miss")
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        metrics.search_cache_requests.inc(result="hit")
+        return item[2]
+
+    def put(self, key, value, version):
+        """version — natija hisoblanishidan oldin olingan indeks versiyasi"""
+        self._items[key] = (version, time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
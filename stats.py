@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+from pymongo.errors import PyMongoError
+
+# Boshqa workerlardagi o'zgarishlar shu oraliqda bazadan tekshirib olinadi
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "60"))
+
+
+class StatsService:
+    """Statistika hisoblagichlari xotirada: qo'shish/o'chirishda yangilanadi, vaqti-vaqti bilan solishtiriladi."""
+
+    def __init__(self, users_col, videos_col, pending_col, refresh_interval=STATS_REFRESH_INTERVAL):
+        self.users_col = users_col
+        self.videos_col = videos_col
+        self.pending_col = pending_col
+        self.refresh_interval = refresh_interval
+        self.counts = {"users": 0, "videos": 0, "pending": 0}
+        self._text = None
+
+    async def load(self):
+        users, videos, pending = await asyncio.gather(
+            self.users_col.estimated_document_count(),
+            self.videos_col.estimated_document_count(),
+            self.pending_col.count_documents({"status": "pending"}),
+        )
+        self.counts = {"users": users, "videos": videos, "pending": pending}
+        self._text = None
+
+    def add(self, **deltas):
+        for key, delta in deltas.items():
+            self.counts[key] = max(self.counts[key] + delta, 0)
+        self._text = None
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = (
+                f"👤 Foydalanuvchilar: {self.counts['users']}\n"
+                f"🎥 Tasdiqlangan kinolar: {self.counts['videos']}\n"
+                f"⏳ Kutayotgan: {self.counts['pending']}"
+            )
+        return self._text
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                print(f"Statistikani yangilashda xato: {e}")
@@ -0,0 +1,147 @@
+import copy
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from aiogram.dispatcher.storage import BaseStorage
+from pymongo.errors import DuplicateKeyError
+
+# Tugallanmagan suhbat holati shuncha vaqtdan keyin o'chadi (TTL indeks orqali)
+FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 3600)))
+# Xotiradagi o'qish keshi. Bir nechta worker bitta tokenni user bo'yicha
+# taqsimlamasdan ishlatsa — 0 qilish kerak
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+
+_EMPTY = {"state": None, "data": {}, "bucket": {}}
+
+
+class MongoFSMStorage(BaseStorage):
+    """FSM holatlari Mongo'da: (chat, user) uchun bitta hujjat, har bir o'tishda bitta yozuv."""
+
+    def __init__(self, fsm_col, ttl=FSM_TTL, cache_size=FSM_CACHE_SIZE):
+        self.fsm_col = fsm_col
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    async def close(self):
+        self._cache.clear()
+
+    async def wait_closed(self):
+        pass
+
+    def _key(self, chat, user):
+        chat, user = self.check_address(chat=chat, user=user)
+        return f"{chat}:{user}"
+
+    def _expires(self):
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    def _remember(self, key, record):
+        if not self.cache_size:
+            return
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, key):
+        record = self._cache.get(key)
+        if record is not None:
+            self._cache.move_to_end(key)
+            return record
+        doc = await self.fsm_col.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        record = {
+            "state": doc.get("state"),
+            "data": doc.get("data") or {},
+            "bucket": doc.get("bucket") or {},
+        } if doc else copy.deepcopy(_EMPTY)
+        self._remember(key, record)
+        return record
+
+    async def _write(self, key, fields, **cached):
+        """Bitta $set; cached — keshdagi yozuvga qo'llanadigan yangi qiymatlar"""
+        now = datetime.now(timezone.utc)
+        fields["expires_at"] = self._expires()
+        try:
+            # Faqat amal qilayotgan hujjat yangilanadi; yo'q bo'lsa — yangisi yaratiladi
+            await self.fsm_col.update_one({"_id": key, "expires_at": {"$gt": now}}, {"$set": fields}, upsert=True)
+        except DuplicateKeyError:
+            # Muddati o'tgan, lekin TTL monitor hali o'chirmagan hujjat: eski
+            # state/data/bucket qaytib kelmasligi uchun to'liq almashtiriladi
+            record = copy.deepcopy(_EMPTY)
+            for name, value in fields.items():
+                if name == "expires_at":
+                    continue
+                if "." in name:
+                    part, sub = name.split(".", 1)
+                    record[part][sub] = value
+                else:
+                    record[name] = value
+            await self.fsm_col.replace_one({"_id": key}, dict(record, expires_at=fields["expires_at"]), upsert=True)
+            self._remember(key, record)
+            return
+        record = self._cache.get(key)
+        if record is not None:
+            record.update(cached)
+
+    async def get_state(self, *, chat=None, user=None, default=None):
+        record = await self._load(self._key(chat, user))
+        return record["state"] if record["state"] is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None):
+        record = await self._load(self._key(chat, user))
+        return copy.deepcopy(record["data"]) if record["data"] else (default or {})
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        key = self._key(chat, user)
+        state = self.resolve_state(state)
+        await self._write(key, {"state": state}, state=state)
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        key = self._key(chat, user)
+        data = copy.deepcopy(data or {})
+        await self._write(key, {"data": data}, data=data)
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        key = self._key(chat, user)
+        changes = dict(data or {}, **kwargs)
+        if not changes:
+            return
+        # O'qimasdan, faqat o'zgargan kalitlarni yozamiz
+        await self._write(key, {f"data.{k}": copy.deepcopy(v) for k, v in changes.items()})
+        record = self._cache.get(key)
+        if record is not None:
+            record["data"] = dict(record["data"], **copy.deepcopy(changes))
+
+    async def reset_state(self, *, chat=None, user=None, with_data=True):
+        key = self._key(chat, user)
+        if with_data:
+            # finish() — hujjat butunlay o'chiriladi (ikki yozuv o'rniga bitta)
+            await self.fsm_col.delete_one({"_id": key})
+            if self.cache_size:
+                self._remember(key, copy.deepcopy(_EMPTY))
+        else:
+            await self.set_state(chat=chat, user=user, state=None)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat=None, user=None, default=None):
+        record = await self._load(self._key(chat, user))
+        return copy.deepcopy(record["bucket"]) if record["bucket"] else (default or {})
+
+    async def set_bucket(self, *, chat=None, user=None, bucket=None):
+        key = self._key(chat, user)
+        bucket = copy.deepcopy(bucket or {})
+        await self._write(key, {"bucket": bucket}, bucket=bucket)
+
+    async def update_bucket(self, *, chat=None, user=None, bucket=None, **kwargs):
+        key = self._key(chat, user)
+        changes = dict(bucket or {}, **kwargs)
+        if not changes:
+            return
+        await self._write(key, {f"bucket.{k}": copy.deepcopy(v) for k, v in changes.items()})
+        record = self._cache.get(key)
+        if record is not None:
+            record["bucket"] = dict(record["bucket"], **copy.deepcopy(changes))
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+
+# Tasdiqlangan obuna qancha vaqt keshda turadi (soniya)
+SUB_CACHE_TTL = int(os.getenv("SUB_CACHE_TTL", "300"))
+# Majburiy kanallar ro'yxati keshi (bir nechta worker bo'lsa ham tez yangilanadi)
+CHANNELS_CACHE_TTL = int(os.getenv("CHANNELS_CACHE_TTL", "60"))
+_MAX_ENTRIES = 200_000
+
+
+class SubscriptionChecker:
+    """Majburiy kanallarga obunani parallel tekshiradi va ijobiy natijalarni keshlaydi."""
+
+    def __init__(self, bot, channels_col, ttl=SUB_CACHE_TTL, channels_ttl=CHANNELS_CACHE_TTL):
+        self.bot = bot
+        self.channels_col = channels_col
+        self.ttl = ttl
+        self.channels_ttl = channels_ttl
+        self._ok = {}  # user_id -> {channel_id: amal qilish muddati}
+        self._channels = None
+        self._channels_expires = 0.0
+
+    async def channels(self):
+        now = time.monotonic()
+        if self._channels is None or now >= self._channels_expires:
+            self._channels = await self.channels_col.find_list({})
+            self._channels_expires = now + self.channels_ttl
+        return self._channels
+
+    def invalidate_channels(self):
+        self._channels = None
+
+    def invalidate_user(self, user_id: int):
+        self._ok.pop(user_id, None)
+
+    async def _is_member(self, user_id: int, channel_id) -> bool:
+        try:
+            chat_member = await self.bot.get_chat_member(chat_id=channel_id, user_id=user_id)
+            return chat_member.status not in ['left', 'kicked']
+        except Exception as e:
+            print(f"❌ Kanal tekshirishda xato (ID: {channel_id}): {e}")
+            return False
+
+    def _remember(self, user_id: int, channel_ids, now: float):
+        if not channel_ids:
+            return
+        if user_id not in self._ok and len(self._ok) >= _MAX_ENTRIES:
+            self._ok = {uid: cached for uid, cached in self._ok.items()
+                        if max(cached.values(), default=0) > now}
+        self._ok.setdefault(user_id, {}).update(dict.fromkeys(channel_ids, now + self.ttl))
+
+    async def is_subscribed(self, user_id: int) -> bool:
+        channels = await self.channels()
+        if not channels:
+            return True
+        now = time.monotonic()
+        cached = self._ok.get(user_id, {})
+        unknown = [ch['channel_id'] for ch in channels
+                   if cached.get(ch['channel_id'], 0) <= now]
+        if not unknown:
+            return True
+        results = await asyncio.gather(*(self._is_member(user_id, ch_id) for ch_id in unknown))
+        self._remember(user_id, [ch_id for ch_id, ok in zip(unknown, results) if ok], now)
+        return all(results)
@@ -0,0 +1,148 @@
+import asyncio
+import multiprocessing
+import os
+
+from aiohttp import web
+from aiogram.utils.exceptions import NetworkError, RetryAfter, TelegramAPIError
+
+import metrics
+
+# Worker navbati to'lsa supervisor kutadi (Telegram'ga teskari bosim)
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+
+_USER_KEYS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "my_chat_member", "chat_member", "chat_join_request", "shipping_query",
+    "pre_checkout_query", "poll_answer",
+)
+
+
+def shard_of(update: dict, workers: int) -> int:
+    """Bitta foydalanuvchining barcha update'lari (va FSM holati) bitta workerga tushadi"""
+    for key in _USER_KEYS:
+        obj = update.get(key)
+        if not obj:
+            continue
+        user = obj.get("from") or obj.get("user") or obj.get("chat") or {}
+        return int(user.get("id", 0)) % workers
+    return 0
+
+
+class Supervisor:
+    """Update'larni qabul qilib, user_id bo'yicha worker jarayonlarga taqsimlaydi."""
+
+    def __init__(self, bot, workers: int, worker_target):
+        self.bot = bot
+        self.workers = workers
+        self.worker_target = worker_target  # fn(index, queue) — alohida jarayonda ishlaydi
+        self._ctx = multiprocessing.get_context("spawn")
+        self.queues = [self._ctx.Queue(WORKER_QUEUE_SIZE) for _ in range(workers)]
+        self.processes = [None] * workers
+        self._stopping = False
+        metrics.Gauge("bot_worker_queue_depth", "Worker navbatidagi update'lar", fn=self._queue_depths,
+                      labelnames=("worker",))
+        metrics.Gauge("bot_workers_alive", "Ishlayotgan worker jarayonlar",
+                      fn=lambda: sum(1 for p in self.processes if p and p.is_alive()))
+
+    def _queue_depths(self):
+        depths = {}
+        for index, queue in enumerate(self.queues):
+            try:
+                depths[(index,)] = queue.qsize()
+            except NotImplementedError:  # macOS
+                pass
+        return depths
+
+    def _start_worker(self, index: int):
+        process = self._ctx.Process(
+            target=self.worker_target, args=(index, self.queues[index]),
+            name=f"bot-worker-{index}", daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        print(f"👷 Worker {index} ishga tushdi (pid {process.pid})")
+
+    async def _monitor(self):
+        while not self._stopping:
+            await asyncio.sleep(5)
+            for index, process in enumerate(self.processes):
+                if not self._stopping and not process.is_alive():
+                    print(f"⚠️ Worker {index} to'xtadi (exit {process.exitcode}), qayta ishga tushiramiz")
+                    self._start_worker(index)
+
+    async def route(self, update: dict):
+        queue = self.queues[shard_of(update, self.workers)]
+        await asyncio.get_running_loop().run_in_executor(None, queue.put, update)
+
+    async def _poll(self):
+        await self.bot.delete_webhook()
+        # Eski update'larni tashlab yuborish (skip_updates)
+        skipped = await self.bot.request("getUpdates", {"offset": -1, "timeout": 0})
+        offset = skipped[-1]["update_id"] + 1 if skipped else None
+        while not self._stopping:
+            try:
+                params = {"timeout": 20}
+                if offset is not None:
+                    params["offset"] = offset
+                updates = await self.bot.request("getUpdates", params)
+            except RetryAfter as e:
+                await asyncio.sleep(e.timeout)
+                continue
+            except (NetworkError, TelegramAPIError) as e:
+                print(f"getUpdates xato: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await self.route(update)
+                offset = update["update_id"] + 1
+
+    def create_app(self, mode: str, webhook_url: str = "", webhook_path: str = "/webhook",
+                   webhook_secret: str = "") -> web.Application:
+        async def webhook_handler(request: web.Request):
+            if webhook_secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != webhook_secret:
+                return web.Response(status=403)
+            await self.route(await request.json())
+            return web.Response(text="ok")
+
+        async def health(request: web.Request):
+            alive = sum(1 for p in self.processes if p and p.is_alive())
+            status = 200 if alive == self.workers else 503
+            return web.Response(text=f"OK {alive}/{self.workers}", status=status)
+
+        async def metrics_handler(request: web.Request):
+            return web.Response(body=metrics.render().encode(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+        async def on_startup(app: web.Application):
+            for index in range(self.workers):
+                self._start_worker(index)
+            app["monitor"] = asyncio.create_task(self._monitor())
+            app["loop_lag"] = asyncio.create_task(metrics.watch_loop_lag())
+            if mode == "webhook":
+                await self.bot.set_webhook(
+                    webhook_url.rstrip("/") + webhook_path,
+                    drop_pending_updates=True,
+                    max_connections=100,
+                    secret_token=webhook_secret or None
+                )
+            else:
+                app["polling"] = asyncio.create_task(self._poll())
+
+        async def on_shutdown(app: web.Application):
+            self._stopping = True
+            if "polling" in app:
+                app["polling"].cancel()
+            loop = asyncio.get_running_loop()
+            for queue in self.queues:
+                await loop.run_in_executor(None, queue.put, None)
+            for process in self.processes:
+                await loop.run_in_executor(None, process.join, 30)
+            await (await self.bot.get_session()).close()
+
+        app = web.Application()
+        app.router.add_get("/health", health)
+        app.router.add_get("/metrics", metrics_handler)
+        if mode == "webhook":
+            app.router.add_post(webhook_path, webhook_handler)
+        app.on_startup.append(on_startup)
+        app.on_shutdown.append(on_shutdown)
+        return app
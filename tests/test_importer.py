@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+
+import mongomock
+import pymongo
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost")
+pymongo.MongoClient = lambda *args, **kwargs: mongomock.MongoClient()
+
+from database import AsyncCollection, CodeAllocator  # noqa: E402
+from importer import CatalogImporter, _ManifestFile  # noqa: E402
+
+
+@pytest.fixture
+def importer():
+    db = mongomock.MongoClient().db
+    videos = AsyncCollection(db["approved_videos"])
+    videos.sync.create_index("code", unique=True)
+    counters = AsyncCollection(db["counters"])
+    return CatalogImporter(videos, counters, AsyncCollection(db["mirror_queue"]), CodeAllocator(counters))
+
+
+def _line(message_id, title, code=None):
+    entry = {"chat_id": -100123, "message_id": message_id, "title": title}
+    if code is not None:
+        entry["code"] = code
+    return json.dumps(entry)
+
+
+def test_auto_code_does_not_take_later_explicit_code(importer):
+    report = asyncio.run(importer.run([_line(1, "Avtomatik"), _line(2, "Qo'lda", "0001")]))
+
+    assert (report.inserted, report.skipped, report.invalid) == (2, 0, 0)
+    codes = {doc["title"]: doc["code"] for doc in importer.videos_col.sync.find()}
+    assert codes["Qo'lda"] == "0001"
+    assert codes["Avtomatik"] == "0002"
+
+
+def test_explicit_code_in_later_batch_is_kept(importer):
+    importer.batch_size = 1
+    lines = [_line(1, "A"), _line(2, "B"), _line(3, "C", "0002"), _line(4, "D", "0001")]
+    report = asyncio.run(importer.run(lines))
+
+    assert report.inserted == 4
+    codes = {doc["title"]: doc["code"] for doc in importer.videos_col.sync.find()}
+    assert (codes["C"], codes["D"]) == ("0002", "0001")
+    assert sorted([codes["A"], codes["B"]]) == ["0003", "0004"]
+
+
+def test_reserved_block_is_dropped_after_explicit_codes(importer):
+    assert asyncio.run(importer.code_allocator.next_code()) == "0001"  # 0001..0010 band
+    asyncio.run(importer.run([_line(1, "Qo'lda", "0005")]))
+
+    assert asyncio.run(importer.code_allocator.next_code()) == "0011"
+
+
+def test_rerun_skips_existing_films(importer):
+    lines = [_line(1, "A"), _line(2, "B", "0100")]
+    asyncio.run(importer.run(lines))
+    report = asyncio.run(importer.run(lines))
+
+    assert (report.inserted, report.skipped) == (0, 2)
+
+
+def test_large_manifest_without_codes_is_written_batch_by_batch(importer, tmp_path):
+    importer.batch_size = 100
+    path = tmp_path / "archive.jsonl"
+    path.write_text("\n".join(_line(i, f"Kino {i}") for i in range(1, 1001)) + "\n")
+    inserted = []
+
+    async def progress(report):
+        inserted.append(report.inserted)
+
+    report = asyncio.run(importer.run(_ManifestFile(str(path)), progress=progress))
+
+    assert (report.inserted, report.invalid) == (1000, 0)
+    # Har partiya darhol yoziladi — fayl oxirini kutmaydi
+    assert inserted[:3] == [100, 200, 300]
+    codes = [doc["code"] for doc in importer.videos_col.sync.find()]
+    assert len(set(codes)) == 1000
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+USERS_FLUSH_INTERVAL = float(os.getenv("USERS_FLUSH_INTERVAL", "5"))
+# Bufer shu hajmga yetsa, kutmasdan yoziladi
+USERS_FLUSH_SIZE = int(os.getenv("USERS_FLUSH_SIZE", "1000"))
+# Bitta foydalanuvchining last_seen qiymati bundan tez-tez yozilmaydi (soniya)
+LAST_SEEN_RESOLUTION = float(os.getenv("LAST_SEEN_RESOLUTION", "600"))
+_MAX_SEEN = 200_000
+
+
+class UserRegistry:
+    """Ro'yxatdan o'tkazish va last_seen: bufer + bitta bulk upsert."""
+
+    def __init__(self, users_col, interval=USERS_FLUSH_INTERVAL, flush_size=USERS_FLUSH_SIZE,
+                 resolution=LAST_SEEN_RESOLUTION):
+        self.users_col = users_col
+        self.interval = interval
+        self.flush_size = flush_size
+        self.resolution = resolution
+        self._pending = {}  # user_id -> {"username", "last_seen"}
+        self._seen = {}     # user_id -> (username, oxirgi yozilgan vaqt)
+        self._lock = asyncio.Lock()
+        self.listeners = []  # async fn(new_users) — yangi qo'shilganlar soni bilan
+        self._flush_task = None
+
+    def touch(self, user_id: int, username: str = None):
+        user_id = int(user_id)
+        now = time.monotonic()
+        seen = self._seen.get(user_id)
+        if seen and seen[0] == username and now - seen[1] < self.resolution:
+            return
+        self._pending[user_id] = {"username": username, "last_seen": datetime.now(timezone.utc)}
+        if len(self._seen) >= _MAX_SEEN:
+            self._seen.clear()
+        self._seen[user_id] = (username, now)
+        if len(self._pending) >= self.flush_size and not (self._flush_task and not self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            ops = [
+                UpdateOne(
+                    {"user_id": user_id},
+                    {
+                        "$set": {"username": info["username"], "last_seen": info["last_seen"]},
+                        "$setOnInsert": {"joined_at": info["last_seen"]},
+                    },
+                    upsert=True
+                )
+                for user_id, info in pending.items()
+            ]
+            try:
+                result = await self.users_col.bulk_write(ops, ordered=False)
+                new_users = result.upserted_count
+            except BulkWriteError as e:
+                # Parallel upsert'dagi duplicate key — foydalanuvchi baribir mavjud
+                new_users = e.details.get("nUpserted", 0)
+            except PyMongoError as e:
+                print(f"Foydalanuvchilarni yozishda xato, keyingi safar qayta urinamiz: {e}")
+                for user_id, info in pending.items():
+                    self._pending.setdefault(user_id, info)
+                return
+        for listener in self.listeners:
+            await listener(new_users)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # To'xtashda bekor qilinsa ham boshlangan yozuv oxiriga yetadi
+            await asyncio.shield(self.flush())
+
+
+class LastSeenMiddleware(BaseMiddleware):
+    """Har bir xabar va tugma bosilishida foydalanuvchini buferga yozadi (DB ga murojaat qilmaydi)."""
+
+    def __init__(self, registry: UserRegistry):
+        super().__init__()
+        self.registry = registry
+
+    async def on_pre_process_message(self, message, data):
+        if message.from_user and message.chat.type == "private":
+            self.registry.touch(message.from_user.id, message.from_user.username)
+
+    async def on_pre_process_callback_query(self, callback, data):
+        self.registry.touch(callback.from_user.id, callback.from_user.username)
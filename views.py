@@ -0,0 +1,126 @@
+import asyncio
+import os
+from collections import Counter
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# Ko'rishlar soni xotirada yig'iladi va shu oraliqda bitta bulk_write bilan yoziladi
+VIEWS_FLUSH_INTERVAL = float(os.getenv("VIEWS_FLUSH_INTERVAL", "10"))
+# Boshqa workerlarning ko'rishlarini hisobga olish uchun to'liq qayta yuklash oralig'i
+LEADERBOARD_REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", "300"))
+LEADERBOARD_SIZE = 10
+
+
+class ViewCounter:
+    """Write-behind ko'rishlar hisoblagichi."""
+
+    def __init__(self, videos_col, interval=VIEWS_FLUSH_INTERVAL):
+        self.videos_col = videos_col
+        self.interval = interval
+        self._pending = Counter()
+        self._lock = asyncio.Lock()
+        self.listeners = []  # async fn(increments) — yozilgandan keyin chaqiriladi
+
+    def hit(self, video_id, n: int = 1):
+        self._pending[video_id] += n
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, Counter()
+            ops = [UpdateOne({"_id": _id}, {"$inc": {"views": n}}) for _id, n in pending.items()]
+            try:
+                await self.videos_col.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # Qolgan yozuvlar qo'llangan — faqat xatolarni qayd etamiz
+                print(f"Ko'rishlarni yozishda xato: {e.details.get('writeErrors')}")
+            except PyMongoError as e:
+                print(f"Ko'rishlarni yozishda xato, keyingi safar qayta urinamiz: {e}")
+                self._pending.update(pending)
+                return
+        for listener in self.listeners:
+            try:
+                await listener(pending)
+            except PyMongoError as e:
+                print(f"Ko'rishlar tinglovchisida xato: {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # To'xtashda bekor qilinsa ham boshlangan yozuv oxiriga yetadi
+            await asyncio.shield(self.flush())
+
+
+def render_top(entries) -> str:
+    if not entries:
+        return "Hali hech qanday kino qo'shilmagan."
+    text = "🏆 Top 10 kinolar:\n\n"
+    for i, v in enumerate(entries, 1):
+        title = v.get('title', 'Noma\'lum')
+        code = v.get('code', 'Kod yo\'q')
+        typ = '📺 Serial' if v.get('is_serial') else '🎥 Kino'
+        text += f"{i}. {title} (Kod: {code}) — {typ}\n"
+    return text
+
+
+class Leaderboard:
+    """Top kinolar xotirada, tayyor matni bilan. ViewCounter yozgan ko'rishlar bilan yangilanadi."""
+
+    _PROJECTION = {"title": 1, "code": 1, "is_serial": 1, "views": 1}
+
+    def __init__(self, videos_col, size=LEADERBOARD_SIZE, refresh_interval=LEADERBOARD_REFRESH_INTERVAL):
+        self.videos_col = videos_col
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._entries = []
+        self._text = None  # None — qayta yuklash kerak
+
+    async def load(self):
+        self._entries = await self.videos_col.find_list(
+            {}, projection=self._PROJECTION, sort=[("views", -1)], limit=self.size
+        )
+        self._text = render_top(self._entries)
+
+    def invalidate(self):
+        self._text = None
+
+    async def text(self) -> str:
+        if self._text is None:
+            await self.load()
+        return self._text
+
+    def _ranking(self):
+        return [e["_id"] for e in self._entries]
+
+    async def apply(self, increments):
+        if self._text is None:
+            return
+        before = self._ranking()
+        by_id = {e["_id"]: e for e in self._entries}
+        outside = []
+        for _id, n in increments.items():
+            if _id in by_id:
+                by_id[_id]["views"] = by_id[_id].get("views", 0) + n
+            else:
+                outside.append(_id)
+        if outside:
+            # Reytingga faqat oxirgi o'rindagidan ko'proq ko'rilganlar kira oladi
+            threshold = self._entries[-1].get("views", 0) if len(self._entries) >= self.size else -1
+            docs = await self.videos_col.find_list(
+                {"_id": {"$in": outside}, "views": {"$gt": threshold}}, projection=self._PROJECTION
+            )
+            for doc in docs:
+                by_id[doc["_id"]] = doc
+        self._entries = sorted(by_id.values(), key=lambda e: -e.get("views", 0))[:self.size]
+        if self._ranking() != before:
+            self._text = render_top(self._entries)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                print(f"Top kinolarni yangilashda xato: {e}")